@@ -0,0 +1,50 @@
+"""
+Run the benchmark suite with the default parameters of each benchmark, and
+print the results as a single JSON document.
+
+Run from the repository root:
+
+    python -m benchmarks --output benchmarks.json
+    python -m benchmarks --only merge reporters
+
+Benchmarks whose dependencies are missing are reported as skipped.
+"""
+import argparse
+import importlib
+
+from benchmarks.harness import emit, parser
+
+BENCHMARKS = {
+    "vm": "benchmarks.bench_vm",
+    "modes": "benchmarks.bench_modes",
+    "cover_file": "benchmarks.bench_cover_file",
+    "merge": "benchmarks.bench_merge",
+    "reporters": "benchmarks.bench_reporters",
+    "scheduling": "benchmarks.bench_scheduling",
+    "imports": "benchmarks.bench_imports",
+}
+
+
+def main():
+    suite_parser = parser(__doc__)
+    suite_parser.formatter_class = argparse.RawDescriptionHelpFormatter
+    suite_parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    args = suite_parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        try:
+            module = importlib.import_module(BENCHMARKS[name])
+        except ImportError as e:
+            results[name] = {"skipped": str(e)}
+            continue
+        bench_parser = parser(module.__doc__)
+        module.add_arguments(bench_parser)
+        bench_args = bench_parser.parse_args(["--repeat", str(args.repeat)])
+        results[name] = module.benchmark(bench_args)
+
+    emit("suite", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
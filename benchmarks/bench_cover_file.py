@@ -0,0 +1,66 @@
+"""
+cover_file: building the pc to lines index of a large program, and turning
+the touched pcs of a run into covered lines with the cached index.
+
+Needs cairo-lang. Run from the repository root:
+
+    python -m benchmarks.bench_cover_file --functions 2000
+"""
+import sys
+
+from benchmarks.harness import main, measure
+from benchmarks.programs import large_program, start
+from nile_coverage.common import CoverageOptions
+from nile_coverage.utils import build_program_index
+from nile_coverage.vendor.cairo_coverage import (
+    OverrideVm,
+    configure,
+    get_coverage_results,
+)
+
+NAME = "cover_file"
+
+
+def add_arguments(parser):
+    parser.add_argument("--functions", type=int, default=2000)
+
+
+def benchmark(args):
+    program = large_program(args.functions)
+    results = {
+        "functions": args.functions,
+        "instructions": len(program.data),
+        "build_program_index": measure(
+            lambda: build_program_index(program), args.repeat
+        ),
+    }
+
+    for option_name, options in (
+        ("lines", CoverageOptions()),
+        ("hits", CoverageOptions(hits=True)),
+        ("branch", CoverageOptions(branch=True)),
+    ):
+        configure(options)
+        runner, end = start(program, OverrideVm)
+        runner.run_until_pc(end)
+        vm = runner.vm
+        touched_pcs = list(vm.touched_pcs)
+        outcomes = bytearray(getattr(vm, "branch_outcomes", b""))
+        vm.cover_file()  # Builds the index, so the timings below hit the cache.
+
+        def cover_file():
+            # cover_file resets the pcs of the run, set them again.
+            vm.touched_pcs[:] = touched_pcs
+            if options.branch:
+                vm.branch_outcomes[:] = outcomes
+            vm.cover_file()
+
+        results[option_name] = measure(cover_file, args.repeat)
+        get_coverage_results(reset=True)
+    configure(CoverageOptions())
+
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.modules[__name__])
@@ -0,0 +1,99 @@
+"""
+Imports: time spent importing the plugin, in a fresh interpreter for each run,
+as measured by `python -X importtime`.
+
+    help      what every `nile` invocation imports from this plugin (the
+              commands are entry points, loaded even for `nile --help`)
+    coverage  what `nile coverage` imports before starting pytest
+
+`help` must not import any of HEAVY_PACKAGES; --check exits with an error when
+it does, as a regression guard. Run from the repository root:
+
+    python -m benchmarks.bench_imports --repeat 10 --check
+"""
+import subprocess
+import sys
+
+from benchmarks.harness import main
+
+NAME = "imports"
+
+SCENARIOS = {
+    "help": ["nile_coverage.commands"],
+    "coverage": [
+        "nile_coverage.commands",
+        "pytest",
+        "nile_coverage.execution",
+        "nile_coverage.plugins",
+    ],
+}
+
+# Packages the commands must only import once the coverage runs.
+HEAVY_PACKAGES = {"starkware", "pytest", "_pytest", "xdist", "execnet"}
+
+# Prints the heavy packages imported, after the -X importtime output.
+SCRIPT = """
+import sys
+{imports}
+heavy = {heavy!r} & {{name.split(".")[0] for name in sys.modules}}
+print(",".join(sorted(heavy)))
+"""
+
+
+def run(modules):
+    """Import `modules` in a fresh interpreter: (seconds, heavy packages imported)."""
+    script = SCRIPT.format(
+        imports="\n".join(f"import {module}" for module in modules),
+        heavy=HEAVY_PACKAGES,
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # "import time: self [us] | cumulative | imported package", nested
+    # imports being indented: the top level ones add up to the total.
+    total = 0
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            total += int(cumulative)
+    heavy = process.stdout.strip()
+    return total / 1e6, heavy.split(",") if heavy else []
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with an error if `help` imports any of the heavy packages.",
+    )
+
+
+def benchmark(args):
+    results = {}
+    for name, modules in SCENARIOS.items():
+        times = []
+        for _ in range(args.repeat):
+            seconds, heavy = run(modules)
+            times.append(seconds)
+        results[name] = {
+            "min": min(times),
+            "mean": sum(times) / len(times),
+            "repeat": args.repeat,
+            "heavy_packages": heavy,
+        }
+
+    if args.check and results["help"]["heavy_packages"]:
+        sys.exit(
+            "nile_coverage.commands imports "
+            + ", ".join(results["help"]["heavy_packages"])
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.modules[__name__])
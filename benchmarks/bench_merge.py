@@ -0,0 +1,72 @@
+"""
+Merge: reading and merging the coverage data files of N workers, as
+`run_report` does at the end of a session, with the bitset merge of
+`CoverageData.from_directory` and report by report with `from_reports`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_merge --nodes 64 --files 1000
+"""
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks.harness import main, measure, synthetic_coverage
+from nile_coverage.common import CairoTraceReport
+from nile_coverage.data import CoverageData, iter_reports, write_report
+
+NAME = "merge"
+
+
+def add_arguments(parser):
+    parser.add_argument("--nodes", type=int, default=64)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--hits", action="store_true", help="Record hits too.")
+    parser.add_argument("--threads", type=int, help="Reader threads.")
+
+
+def write_node_files(directory, nodes, files, with_hits=False):
+    """
+    Write one data file per node: all of them have the same statements, but
+    each covers its own part of them.
+    """
+    statements, _, _ = synthetic_coverage(files)
+    for node in range(nodes):
+        rng = random.Random(node)
+        covered, hits = {}, {}
+        for file, lines in statements.items():
+            covered[file] = {line for line in lines if rng.random() < 0.3}
+            if with_hits:
+                hits[file] = {line: rng.randint(1, 100) for line in covered[file]}
+        write_report(
+            CairoTraceReport(statements, covered, hits),
+            os.path.join(directory, f"node-gw{node}.nile.coverage"),
+        )
+
+
+def benchmark(args):
+    with tempfile.TemporaryDirectory() as directory:
+        write_node_files(directory, args.nodes, args.files, args.hits)
+        size = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory)
+        )
+        return {
+            "nodes": args.nodes,
+            "files": args.files,
+            "hits": args.hits,
+            "bytes": size,
+            "merge": measure(
+                lambda: CoverageData.from_directory(directory, args.threads),
+                args.repeat,
+            ),
+            "merge_reports": measure(
+                lambda: CoverageData.from_reports(iter_reports(directory)),
+                args.repeat,
+            ),
+        }
+
+
+if __name__ == "__main__":
+    main(sys.modules[__name__])
@@ -0,0 +1,83 @@
+"""
+Recording modes: wall time of a long-running synthetic Cairo program with
+the plain VM and with coverage recorded in full, first-touch and sample
+modes, with the lines each mode finds.
+
+The cost of the recording alone (without the VM, whose run time is much
+noisier) is measured too: the per-step hook over as many steps for "full",
+and the trace scan for the other modes.
+
+Needs cairo-lang. Run from the repository root:
+
+    python -m benchmarks.bench_modes --iterations 20000
+"""
+import sys
+
+from starkware.cairo.lang.vm.vm_core import VirtualMachine
+
+from benchmarks.harness import main, measure
+from benchmarks.programs import LOOP, compile_program, run
+from nile_coverage.common import CoverageOptions
+from nile_coverage.vendor.cairo_coverage import (
+    OverrideVm,
+    configure,
+    get_coverage_results,
+)
+
+NAME = "modes"
+
+
+def recording(vm, mode, repeat):
+    """Time the recording of the steps of a finished run of `vm`."""
+    steps = len(vm.trace)
+    if mode == "full":
+        # Call the hook once per step, with nothing to run behind it.
+        vm.old_run_instruction = lambda instruction: None
+        vm.run_context.pc = vm.trace[0].pc
+
+        def record():
+            for _ in range(steps):
+                vm.run_instruction(None)
+
+    else:
+
+        def record():
+            vm.trace_start = 0
+            vm.mark_trace()
+
+    timing = measure(record, repeat)
+    timing["per_step_ns"] = timing["min"] / steps * 1e9
+    return timing
+
+
+def add_arguments(parser):
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--sample-every", type=int, default=100)
+
+
+def benchmark(args):
+    program = compile_program(LOOP, args.iterations)
+    results = {
+        "steps": run(program, VirtualMachine).vm.current_step,
+        "plain": measure(lambda: run(program, VirtualMachine), args.repeat),
+    }
+
+    for mode in ("full", "first-touch", "sample"):
+        configure(CoverageOptions(hits=True, mode=mode, sample_every=args.sample_every))
+        get_coverage_results(reset=True)
+        timing = measure(lambda: run(program, OverrideVm), args.repeat)
+        report = get_coverage_results(reset=True)
+        covered = set().union(*report.covered_lines.values())
+        results[mode] = dict(
+            timing,
+            overhead=timing["min"] / results["plain"]["min"] - 1,
+            covered_lines=len(covered),
+            recording=recording(run(program, OverrideVm).vm, mode, args.repeat),
+        )
+    configure(CoverageOptions())
+
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.modules[__name__])
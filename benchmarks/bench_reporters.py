@@ -0,0 +1,72 @@
+"""
+Reporters: coverage.xml, and the text summary built natively against the
+XML -> pycobertura round trip, on synthetic data with thousands of files.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_reporters --files 2000
+"""
+import os
+import sys
+import tempfile
+
+from benchmarks.harness import main, measure, synthetic_coverage
+from nile_coverage.data import lines_bits
+from nile_coverage.vendor.reporters import TextReporter, XmlReporter
+
+NAME = "reporters"
+
+
+def xml(statements, covered, hits):
+    with tempfile.TemporaryDirectory() as directory:
+        reporter = XmlReporter("contracts", statements, covered, hits)
+        reporter.report(outfile=os.path.join(directory, "coverage.xml"))
+
+
+def text_native(statements, covered, hits):
+    return TextReporter("contracts", statements, covered, hits).generate()
+
+
+def text_pycobertura(statements, covered, hits):
+    from pycobertura import Cobertura
+    from pycobertura.reporters import TextReporter as CoberturaTextReporter
+
+    reporter = XmlReporter("contracts", statements, covered, hits)
+    xml_string = reporter.report(as_string=True)
+    return CoberturaTextReporter(Cobertura(xml_string)).generate()
+
+
+def add_arguments(parser):
+    parser.add_argument("--files", type=int, default=1000)
+
+
+def benchmark(args):
+    statements, covered, hits = synthetic_coverage(args.files)
+    # Lines as the bitsets of the merged data.
+    data = (
+        {file: lines_bits(lines) for file, lines in statements.items()},
+        {file: lines_bits(lines) for file, lines in covered.items()},
+        hits,
+    )
+
+    results = {
+        "files": args.files,
+        "xml": measure(lambda: xml(*data), args.repeat),
+        "text_native": measure(lambda: text_native(*data), args.repeat),
+    }
+    try:
+        results["text_pycobertura"] = measure(
+            lambda: text_pycobertura(*data), args.repeat
+        )
+    except ImportError:
+        results["text_pycobertura"] = None
+    else:
+        results["speedup"] = (
+            results["text_pycobertura"]["min"] / results["text_native"]["min"]
+        )
+
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.modules[__name__])
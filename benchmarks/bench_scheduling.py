@@ -0,0 +1,114 @@
+"""
+Scheduling: simulated wall-clock time of a coverage run with xdist's load
+scheduling against the duration (longest first) scheduling.
+
+The schedulers are driven by simulated workers running tests whose
+durations follow a long-tailed distribution, with the recorded durations
+off by up to 20% from the actual ones. Run from the repository root:
+
+    python -m benchmarks.bench_scheduling --tests 500 --workers 8
+"""
+import heapq
+import random
+import sys
+from types import SimpleNamespace
+
+from xdist.scheduler import LoadScheduling
+
+from benchmarks.harness import main
+from nile_coverage.xdist.scheduler import DurationScheduling
+
+NAME = "scheduling"
+
+
+class SimulatedNode:
+    """The parts of a WorkerController used by the schedulers."""
+
+    def __init__(self, name):
+        self.gateway = SimpleNamespace(id=name)
+        self.queue = []
+        self.shutting_down = False
+
+    def send_runtest_some(self, indices):
+        self.queue.extend(indices)
+
+    def shutdown(self):
+        self.shutting_down = True
+
+
+def simulate(make_scheduler, durations, nb_workers):
+    """Makespan of the run, in the simulated seconds of `durations`."""
+    config = SimpleNamespace(getvalue=lambda name: [f"{nb_workers}*popen"])
+    log = SimpleNamespace(loadsched=lambda *args: None)
+    scheduler = make_scheduler(config, log)
+    collection = list(durations)
+    nodes = [SimulatedNode(f"gw{i}") for i in range(nb_workers)]
+    for node in nodes:
+        scheduler.add_node(node)
+        scheduler.add_node_collection(node, collection)
+    scheduler.schedule()
+
+    now, events, busy = 0.0, [], set()
+
+    def start(node):
+        # Like the remote worker, wait for the next item unless shutting down.
+        if node in busy or not node.queue:
+            return
+        if len(node.queue) < 2 and not node.shutting_down:
+            return
+        busy.add(node)
+        index = node.queue.pop(0)
+        heapq.heappush(
+            events, (now + durations[collection[index]], node.gateway.id, node, index)
+        )
+
+    for node in nodes:
+        start(node)
+    while events:
+        now, _, node, index = heapq.heappop(events)
+        busy.discard(node)
+        scheduler.mark_test_complete(node, index, durations[collection[index]])
+        for other in nodes:
+            start(other)
+    return now
+
+
+def add_arguments(parser):
+    parser.add_argument("--tests", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+
+
+def benchmark(args):
+    results = {"tests": args.tests, "workers": args.workers, "runs": []}
+    for seed in range(args.repeat):
+        rng = random.Random(seed)
+        durations = {
+            f"tests/test_{i // 20}.py::test_{i}": rng.lognormvariate(0, 1.2)
+            for i in range(args.tests)
+        }
+        recorded = {
+            nodeid: duration * rng.uniform(0.8, 1.2)
+            for nodeid, duration in durations.items()
+        }
+        load = simulate(LoadScheduling, durations, args.workers)
+        duration = simulate(
+            lambda config, log: DurationScheduling(config, log, recorded),
+            durations,
+            args.workers,
+        )
+        results["runs"].append(
+            {
+                "ideal": sum(durations.values()) / args.workers,
+                "load": load,
+                "duration": duration,
+            }
+        )
+
+    results["speedup"] = sum(run["load"] for run in results["runs"]) / sum(
+        run["duration"] for run in results["runs"]
+    )
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.modules[__name__])
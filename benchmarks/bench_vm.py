@@ -0,0 +1,58 @@
+"""
+VM: wall time of representative Cairo programs with the stock VM and with
+the coverage VM, recording lines, execution counts (hits) or branches.
+
+Needs cairo-lang. Run from the repository root:
+
+    python -m benchmarks.bench_vm --size 2000
+"""
+import sys
+
+from starkware.cairo.lang.vm.vm_core import VirtualMachine
+
+from benchmarks.harness import main, measure
+from benchmarks.programs import PROGRAMS, compile_program, run
+from nile_coverage.common import CoverageOptions
+from nile_coverage.vendor.cairo_coverage import (
+    OverrideVm,
+    configure,
+    get_coverage_results,
+)
+
+NAME = "vm"
+
+OPTIONS = {
+    "lines": CoverageOptions(),
+    "hits": CoverageOptions(hits=True),
+    "branch": CoverageOptions(branch=True),
+}
+
+
+def add_arguments(parser):
+    parser.add_argument("--size", type=int, default=2000)
+
+
+def benchmark(args):
+    results = {}
+    for name, source in PROGRAMS.items():
+        program = compile_program(source, args.size)
+        plain = measure(lambda: run(program, VirtualMachine), args.repeat)
+        program_results = {
+            "steps": run(program, VirtualMachine).vm.current_step,
+            "plain": plain,
+        }
+        for option_name, options in OPTIONS.items():
+            configure(options)
+            timing = measure(lambda: run(program, OverrideVm), args.repeat)
+            program_results[option_name] = dict(
+                timing, overhead=timing["min"] / plain["min"] - 1
+            )
+            get_coverage_results(reset=True)
+        results[name] = program_results
+    configure(CoverageOptions())
+
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.modules[__name__])
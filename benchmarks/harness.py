@@ -0,0 +1,77 @@
+"""Timing helpers and synthetic data shared by the benchmarks."""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+
+def measure(func: Callable[[], object], repeat: int = 5) -> Dict[str, float]:
+    """Run `func` `repeat` times, returning wall times in seconds."""
+    times: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        "min": min(times),
+        "mean": sum(times) / len(times),
+        "repeat": repeat,
+    }
+
+
+def synthetic_coverage(
+    nb_files: int,
+    lines_per_file: int = 200,
+    covered_ratio: float = 0.6,
+    folder: str = "contracts",
+    seed: int = 0,
+):
+    """
+    Build `statements`, `covered` and `hits` dicts shaped like merged
+    worker data, spread over a few nested packages.
+    """
+    rng = random.Random(seed)
+    statements, covered, hits = {}, {}, {}
+    for i in range(nb_files):
+        file = f"{folder}/package{i % 16}/module{i % 5}/contract{i}.cairo"
+        lines = set(rng.sample(range(1, lines_per_file * 3), lines_per_file))
+        statements[file] = lines
+        covered[file] = {line for line in lines if rng.random() < covered_ratio}
+        hits[file] = Counter({line: rng.randint(1, 100) for line in covered[file]})
+    return statements, covered, hits
+
+
+def parser(description: str) -> argparse.ArgumentParser:
+    """Command line arguments common to all the benchmarks."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    return parser
+
+
+def main(module, argv: List[str] = None):
+    """
+    Command line entry point of a benchmark module, which defines `NAME`,
+    `add_arguments(parser)` and `benchmark(args)` returning its results.
+    """
+    bench_parser = parser(module.__doc__)
+    module.add_arguments(bench_parser)
+    args = bench_parser.parse_args(argv)
+    emit(module.NAME, module.benchmark(args), args.output)
+
+
+def emit(name: str, results: Dict[str, object], output: str = None):
+    """Print the results as JSON, and write them to `output` if given."""
+    document = {
+        "benchmark": name,
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as fp:
+            fp.write(text + "\n")
@@ -0,0 +1,135 @@
+"""Synthetic Cairo programs, and running them with a given VM class."""
+from starkware.cairo.lang.cairo_constants import DEFAULT_PRIME
+from starkware.cairo.lang.compiler.cairo_compile import compile_cairo
+from starkware.cairo.lang.vm import cairo_runner
+from starkware.cairo.lang.vm.vm_core import VirtualMachine
+
+# A loop with a rarely taken branch, like the hot paths of integration tests.
+LOOP = """
+func step(i: felt, acc: felt) -> felt {
+    if (i * (i - 1000) == 0) {
+        return acc + 1;
+    }
+    return acc * 3 + i;
+}
+
+func loop(n: felt, acc: felt) -> felt {
+    if (n == 0) {
+        return acc;
+    }
+    let acc = step(n, acc);
+    return loop(n - 1, acc);
+}
+
+func main() {
+    loop(SIZE, 1);
+    return ();
+}
+"""
+
+# Fills an array in memory, then sums it back.
+MEMORY = """
+from starkware.cairo.common.alloc import alloc
+
+func fill(array: felt*, n: felt) {
+    if (n == 0) {
+        return ();
+    }
+    assert [array] = n * n;
+    return fill(array + 1, n - 1);
+}
+
+func sum(array: felt*, n: felt) -> felt {
+    if (n == 0) {
+        return 0;
+    }
+    let rest = sum(array + 1, n - 1);
+    return [array] + rest;
+}
+
+func main() {
+    alloc_locals;
+    let (local array: felt*) = alloc();
+    fill(array, SIZE);
+    sum(array, SIZE);
+    return ();
+}
+"""
+
+# Deep call chains with many locals, as in contracts calling libraries.
+CALLS = """
+func leaf(a: felt, b: felt) -> (x: felt, y: felt) {
+    alloc_locals;
+    local c = a * b;
+    local d = a + b;
+    return (x=c + d, y=c - d);
+}
+
+func middle(a: felt) -> felt {
+    let (x, y) = leaf(a, a + 1);
+    let (z, _) = leaf(x, y);
+    return z;
+}
+
+func loop(n: felt, acc: felt) -> felt {
+    if (n == 0) {
+        return acc;
+    }
+    let value = middle(n);
+    return loop(n - 1, acc + value);
+}
+
+func main() {
+    loop(SIZE, 0);
+    return ();
+}
+"""
+
+PROGRAMS = {"loop": LOOP, "memory": MEMORY, "calls": CALLS}
+
+# One of the functions of `large_program`.
+FUNCTION = """
+func fINDEX(x: felt) -> felt {
+    if (x == INDEX) {
+        return x + INDEX;
+    }
+    let y = x * (INDEX + 1);
+    return y - 1;
+}
+"""
+
+
+def compile_program(source: str, size: int):
+    """Compile a program, with SIZE replaced by `size`."""
+    return compile_cairo(
+        source.replace("SIZE", str(size)), DEFAULT_PRIME, debug_info=True
+    )
+
+
+def large_program(nb_functions: int):
+    """Compile a program with many functions, all called from main."""
+    functions = "".join(FUNCTION.replace("INDEX", str(i)) for i in range(nb_functions))
+    calls = "".join(f"    f{i}({i % 3});\n" for i in range(nb_functions))
+    source = functions + f"\nfunc main() {{\n{calls}    return ();\n}}\n"
+    return compile_cairo(source, DEFAULT_PRIME, debug_info=True)
+
+
+def start(program, vm_class):
+    """Initialize a runner of the program, whose VM is a `vm_class`."""
+    cairo_runner.VirtualMachine = vm_class
+    try:
+        runner = cairo_runner.CairoRunner(program, layout="plain")
+        runner.initialize_segments()
+        end = runner.initialize_main_entrypoint()
+        runner.initialize_vm({})
+    finally:
+        cairo_runner.VirtualMachine = VirtualMachine
+    return runner, end
+
+
+def run(program, vm_class):
+    """Run the program to the end with the given VM class."""
+    runner, end = start(program, vm_class)
+    runner.run_until_pc(end)
+    runner.end_run()
+    return runner
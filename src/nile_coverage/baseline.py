@@ -0,0 +1,132 @@
+"""Coverage baselines: what changed since a previous run, and thresholds."""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from nile_coverage.common import count_bits
+from nile_coverage.data import CoverageData
+
+BASELINE_FILE = "coverage.baseline"
+
+# Exit code when the coverage is under a threshold: the first one pytest doesn't
+# use (see `pytest.ExitCode`), so it can't be mistaken for an interrupted run.
+FAIL_UNDER_EXIT_CODE = 6
+
+
+@dataclass
+class BaselineOptions:
+    """What to do with the coverage of the run once reported."""
+
+    save: Optional[str] = None  # Save it as a baseline in this file.
+    diff_against: Optional[str] = None  # Compare it with this baseline.
+    fail_under: Optional[float] = None  # Minimum coverage, in percent.
+    # Minimum coverage of the statements added since the baseline, in percent.
+    fail_under_diff: Optional[float] = None
+
+
+@dataclass
+class FileDiff:
+    """The lines of a file now and in the baseline, as bitsets (see `CoverageData`)."""
+
+    name: str  # Filename.
+    statements: int  # Lines with code.
+    covered: int  # Tested lines.
+    old_statements: int  # Lines with code in the baseline.
+    old_covered: int  # Tested lines in the baseline.
+
+    def __post_init__(self):
+        """Finish initialization."""
+        self.covered &= self.statements
+        self.old_covered &= self.old_statements
+        # Statements that are not in the baseline.
+        self.added = self.statements & ~self.old_statements
+        # Lines tested now and not in the baseline.
+        self.newly_covered = self.covered & ~self.old_covered
+        # Statements not tested now, that were tested or new in the baseline.
+        self.newly_missed = (
+            self.statements & ~self.covered & (self.old_covered | self.added)
+        )
+        self.changed = bool(
+            self.newly_covered
+            or self.newly_missed
+            or self.statements != self.old_statements
+        )
+
+
+class CoverageDiff:
+    """The coverage of a run compared with a baseline, file by file."""
+
+    def __init__(self, baseline: CoverageData, current: CoverageData):
+        self.files = [
+            FileDiff(
+                name=file,
+                statements=current.statements.get(file, 0),
+                covered=current.covered.get(file, 0),
+                old_statements=baseline.statements.get(file, 0),
+                old_covered=baseline.covered.get(file, 0),
+            )
+            for file in sorted(set(baseline.statements) | set(current.statements))
+        ]
+
+    @property
+    def changed(self) -> List[FileDiff]:
+        """Files whose statements or tested lines changed."""
+        return [file for file in self.files if file.changed]
+
+    @property
+    def before(self) -> float:
+        """Coverage of the baseline, in percent."""
+        return percent(
+            sum(count_bits(file.old_covered) for file in self.files),
+            sum(count_bits(file.old_statements) for file in self.files),
+        )
+
+    @property
+    def after(self) -> float:
+        """Coverage of the run, in percent."""
+        return percent(
+            sum(count_bits(file.covered) for file in self.files),
+            sum(count_bits(file.statements) for file in self.files),
+        )
+
+    @property
+    def nb_added(self) -> int:
+        """Number of statements added since the baseline."""
+        return sum(count_bits(file.added) for file in self.files)
+
+    @property
+    def diff_coverage(self) -> Optional[float]:
+        """Coverage of the added statements in percent, None without any."""
+        if not self.nb_added:
+            return None
+        return percent(
+            sum(count_bits(file.added & file.covered) for file in self.files),
+            self.nb_added,
+        )
+
+
+def percent(hit: int, num: int) -> float:
+    """Percentage of `hit`/`num`, 100 without anything to hit (as `rate`)."""
+    return 100.0 * hit / num if num else 100.0
+
+
+def contracts_coverage(
+    contracts_folder: str, statements: Dict[str, int], covered: Dict[str, int]
+) -> CoverageData:
+    """
+    The statements and tested lines of the files of the contracts folder, from
+    their bitsets (see `CoverageData`).
+    """
+    coverage = CoverageData()
+    for file, bits in statements.items():
+        if file.startswith(contracts_folder):
+            coverage.statements[file] = bits
+            coverage.covered[file] = covered.get(file, 0) & bits
+    return coverage
+
+
+def coverage_percent(coverage: CoverageData) -> float:
+    """Line coverage, in percent."""
+    return percent(
+        sum(map(count_bits, coverage.covered.values())),
+        sum(map(count_bits, coverage.statements.values())),
+    )
@@ -0,0 +1,328 @@
+"""Persistent caches kept under the project between coverage runs."""
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:
+    import importlib_metadata
+
+CACHE_DIRECTORY = ".nile-coverage-cache"
+
+# Bump when the content of the cache entries changes.
+CACHE_VERSION = 2
+
+# Size over which the least recently used compiled contracts are removed.
+COMPILED_CACHE_SIZE = 256 * 1024 * 1024
+
+IMPORT_RE = re.compile(r"^\s*from\s+([\w.]+)\s+import\b", re.MULTILINE)
+
+
+def cairo_lang_version() -> str:
+    """Version of the installed compiler, part of every cache key."""
+    try:
+        return importlib_metadata.version("cairo-lang")
+    except importlib_metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def cairo_lang_root() -> Optional[str]:
+    """
+    Directory containing the starkware package, which the compiler searches
+    for imports after the cairo path and the current directory: the Cairo
+    libraries installed with pip are found there too.
+    """
+    try:
+        spec = importlib.util.find_spec("starkware")
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return os.path.dirname(list(spec.submodule_search_locations)[0])
+
+
+class SourceHasher:
+    """
+    Hash Cairo files together with the files they import.
+
+    Imports are resolved as the compiler does: against the cairo path, the
+    current directory, then the directory containing cairo-lang, where the
+    libraries installed with pip are. Modules that can't be found anywhere
+    are left to the compiler to report.
+    """
+
+    def __init__(self, cairo_path: Optional[List[str]] = None):
+        self.search_path = list(cairo_path or []) + [os.getcwd()]
+        root = cairo_lang_root()
+        if root is not None:
+            self.search_path.append(root)
+        self._digests: Dict[str, str] = {}
+        self._imports: Dict[str, List[str]] = {}
+
+    def _read(self, file: str):
+        with open(file, "rb") as fp:
+            content = fp.read()
+        self._digests[file] = hashlib.sha256(content).hexdigest()
+        self._imports[file] = [
+            path
+            for path in map(self._resolve, IMPORT_RE.findall(content.decode()))
+            if path is not None
+        ]
+
+    def _resolve(self, module: str) -> Optional[str]:
+        relative = module.replace(".", os.sep) + ".cairo"
+        for directory in self.search_path:
+            path = os.path.join(directory, relative)
+            if os.path.isfile(path):
+                return os.path.normpath(path)
+        return None
+
+    def digest(self, file: str) -> str:
+        """Digest of the file and everything it imports, recursively."""
+        seen: Set[str] = set()
+        pending = [os.path.normpath(file)]
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            if current not in self._digests:
+                self._read(current)
+            pending.extend(self._imports[current])
+
+        sha = hashlib.sha256(f"{CACHE_VERSION}:{cairo_lang_version()}".encode())
+        for current in sorted(seen):
+            sha.update(f"{current}:{self._digests[current]};".encode())
+        return sha.hexdigest()
+
+
+class StatementCache:
+    """
+    Statement lines (and jnz outcome masks) of Cairo files, so unchanged
+    files skip compilation.
+
+    Entries are keyed by the digest of the source, its imports and the
+    compiler version, so edited files simply miss. The least recently used
+    entries are removed once there are more than `max_entries`.
+    """
+
+    def __init__(
+        self,
+        cairo_path: Optional[List[str]] = None,
+        directory: str = os.path.join(CACHE_DIRECTORY, "statements"),
+        max_entries: int = 5000,
+    ):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hasher = SourceHasher(cairo_path)
+
+    def _path(self, file: str) -> str:
+        return os.path.join(self.directory, self.hasher.digest(file) + ".json")
+
+    def get(self, file: str) -> Optional[Tuple[Set[int], Dict[int, int]]]:
+        """Return the cached statements and branches of the file, if any."""
+        try:
+            path = self._path(file)
+            with open(path, "r") as fp:
+                entry = json.load(fp)
+            lines, branches = entry["lines"], entry["branches"]
+            os.utime(path)  # Mark as recently used.
+        except (OSError, ValueError, KeyError):
+            return None
+        # JSON object keys are strings.
+        return set(lines), {int(line): mask for line, mask in branches.items()}
+
+    def set(self, file: str, lines: Set[int], branches: Dict[int, int]):
+        """Save the statements and branches of the file."""
+        try:
+            path = self._path(file)
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as fp:
+                json.dump(
+                    {"file": file, "lines": sorted(lines), "branches": branches}, fp
+                )
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def prune(self):
+        """Remove the least recently used entries over the size limit."""
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_file()]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[: len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class CompiledCache:
+    """
+    Contracts compiled with `compile_starknet_files`, debug info included,
+    so unchanged contracts are compiled once for all the workers and runs.
+
+    Entries are keyed by the digest of the sources and their imports (which
+    includes the compiler version), the cairo path and the compilation
+    options. They are written to a temporary file renamed once complete, so
+    concurrent workers never read a partial entry, and the least recently
+    used ones are removed once the entries take more than `max_bytes`.
+    Contracts are also kept in memory, so a worker deploying the same
+    contract again gets the same program, and its pc to lines index.
+    """
+
+    def __init__(
+        self,
+        directory: str = os.path.join(CACHE_DIRECTORY, "compiled"),
+        max_bytes: int = COMPILED_CACHE_SIZE,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._hashers: Dict[Tuple[str, ...], SourceHasher] = {}
+        self._loaded: Dict[str, Any] = {}
+
+    def key(self, files: List[str], cairo_path: Optional[List[str]], options) -> str:
+        """Key of the compilation of the files, given its options."""
+        search_path = tuple(cairo_path or ())
+        if search_path not in self._hashers:
+            self._hashers[search_path] = SourceHasher(list(search_path))
+        hasher = self._hashers[search_path]
+        key = [files, [hasher.digest(file) for file in files], search_path, options]
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def compile(
+        self,
+        compile_files: Callable[..., Any],
+        files: List[str],
+        cairo_path: Optional[List[str]] = None,
+        **options,
+    ):
+        """Return the compiled contract, calling `compile_files` on a miss."""
+        try:
+            key = self.key(files, cairo_path, options)
+        except OSError:  # Missing source, let the compiler report it.
+            return compile_files(files, cairo_path=cairo_path, **options)
+
+        contract_class = self._loaded.get(key)
+        if contract_class is None:
+            contract_class = self._read(key)
+        if contract_class is None:
+            self.misses += 1
+            contract_class = compile_files(files, cairo_path=cairo_path, **options)
+            self._write(key, contract_class)
+        else:
+            self.hits += 1
+        self._loaded[key] = contract_class
+        return contract_class
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json.z")
+
+    def _read(self, key: str):
+        from starkware.starknet.services.api.contract_class import ContractClass
+
+        try:
+            path = self._path(key)
+            with open(path, "rb") as fp:
+                data = fp.read()
+            os.utime(path)  # Mark as recently used.
+        except OSError:
+            return None
+        try:
+            return ContractClass.loads(zlib.decompress(data))
+        except Exception:  # Corrupted or incompatible entry, compile again.
+            return None
+
+    def _write(self, key: str, contract_class):
+        try:
+            path = self._path(key)
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as fp:
+                fp.write(zlib.compress(contract_class.dumps().encode(), 1))
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self.prune()
+
+    def prune(self):
+        """Remove the least recently used entries over the size limit."""
+        try:
+            entries = [
+                (entry.path, entry.stat())
+                for entry in os.scandir(self.directory)
+                if entry.is_file() and not entry.name.endswith(".tmp")
+            ]
+        except OSError:
+            return
+        size = sum(stat.st_size for _, stat in entries)
+        entries.sort(key=lambda entry: entry[1].st_mtime)
+        for path, stat in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= stat.st_size
+
+
+# Compiled contracts cache of the process, once installed.
+_compiled_cache: Optional[CompiledCache] = None
+
+
+def install_compiled_cache() -> CompiledCache:
+    """
+    Make `compile_starknet_files` go through the compiled contracts cache in
+    this process: when tests deploy contracts from source, import it
+    afterwards, or when the statements of files never executed are needed.
+    """
+    global _compiled_cache
+    if _compiled_cache is not None:
+        return _compiled_cache
+
+    from starkware.starknet.compiler import compile as compile_module
+    from starkware.starknet.testing import contract_utils
+
+    cache = CompiledCache()
+    compile_starknet_files = compile_module.compile_starknet_files
+
+    def cached_compile_starknet_files(
+        files,
+        debug_info: bool = False,
+        disable_hint_validation: bool = False,
+        cairo_path: Optional[List[str]] = None,
+        opt_unused_functions: bool = True,
+        filter_identifiers: bool = True,
+    ):
+        return cache.compile(
+            compile_starknet_files,
+            list(files),
+            cairo_path,
+            debug_info=debug_info,
+            disable_hint_validation=disable_hint_validation,
+            opt_unused_functions=opt_unused_functions,
+            filter_identifiers=filter_identifiers,
+        )
+
+    for module in (compile_module, contract_utils):
+        module.compile_starknet_files = cached_compile_starknet_files
+    _compiled_cache = cache
+    return cache
+
+
+def get_compiled_cache() -> Optional[CompiledCache]:
+    """The compiled contracts cache of the process, if installed."""
+    return _compiled_cache
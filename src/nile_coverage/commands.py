@@ -1,18 +1,29 @@
 """Coverage command definition."""
 
+import os
 import sys
 
 import asyncclick as click
-import pytest
 
 from nile_coverage import logger
-from nile_coverage.plugins import PytestCairoCoveragePlugin
+from nile_coverage.baseline import BASELINE_FILE, FAIL_UNDER_EXIT_CODE, BaselineOptions
+from nile_coverage.common import HTML_DIRECTORY, CoverageOptions
+from nile_coverage.contexts import CONTEXTS_FILE, ContextIndex
+from nile_coverage.timings import TIMINGS, TIMINGS_FILE
 
 
 @click.command()
 @click.option("--mark", "-m", help="Pytest mark wrapper.")
 @click.option(
-    "--single-thread", "-s", is_flag=True, help="DEPRECATED OPTION."
+    "--single-thread", "-s", is_flag=True, help="Same as --numprocesses 0."
+)
+@click.option(
+    "--numprocesses",
+    "-n",
+    default="auto",
+    show_default=True,
+    help="Number of xdist workers, 0 to run the tests in this process, or auto to "
+    "choose from the number of tests and their recorded durations.",
 )
 @click.option(
     "--contracts-folder",
@@ -23,13 +34,220 @@ from nile_coverage.plugins import PytestCairoCoveragePlugin
 @click.option(
     "--xml", is_flag=True, help="Create a coverage.xml report with Cobertura format."
 )
-def coverage(mark, single_thread, contracts_folder, xml):
+@click.option(
+    "--html",
+    is_flag=True,
+    help=f"Create an HTML report with the annotated source in {HTML_DIRECTORY}/.",
+)
+@click.option(
+    "--hits",
+    is_flag=True,
+    help="Record how many times each line is executed (reported in coverage.xml).",
+)
+@click.option(
+    "--branch",
+    is_flag=True,
+    help="Record which way each conditional jump (jnz) goes, for branch coverage.",
+)
+@click.option(
+    "--mode",
+    type=click.Choice(["full", "first-touch", "sample"]),
+    default="full",
+    show_default=True,
+    help="Record every step, or read the pcs run from the VM trace once per run, "
+    "or sample one step every --sample-every (approximate).",
+)
+@click.option(
+    "--sample-every",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="Steps between two recorded steps with --mode sample.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Send coverage from the workers to the main process instead of using files.",
+)
+@click.option(
+    "--stream-every",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of tests run by a worker between two coverage updates with --stream.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    help="Processes compiling the files never executed and writing the HTML pages "
+    "(default to the CPU count).",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Only run the tests affected by files changed since the last incremental run.",
+)
+@click.option(
+    "--contexts",
+    is_flag=True,
+    help=f"Record the tests covering each line in {CONTEXTS_FILE}.",
+)
+@click.option(
+    "--schedule",
+    type=click.Choice(["load", "duration"]),
+    default="load",
+    show_default=True,
+    help="Send tests in chunks (load) or slowest first, using recorded durations.",
+)
+@click.option(
+    "--compile-cache",
+    is_flag=True,
+    help="Cache the contracts compiled by the tests and the report across runs.",
+)
+@click.option(
+    "--timings",
+    "--profile",
+    is_flag=True,
+    help="Print the wall time, call counts and peak memory of the coverage phases, "
+    f"and save them in {TIMINGS_FILE}.",
+)
+@click.option(
+    "--save-baseline",
+    is_flag=False,
+    flag_value=BASELINE_FILE,
+    help=f"Save the coverage as a baseline (default to '{BASELINE_FILE}').",
+)
+@click.option(
+    "--diff-against",
+    help="Report the files and lines whose coverage changed since this baseline.",
+)
+@click.option(
+    "--fail-under",
+    type=click.FloatRange(0, 100),
+    help="Exit with an error if the coverage is under this percentage.",
+)
+@click.option(
+    "--fail-under-diff",
+    type=click.FloatRange(0, 100),
+    help="Exit with an error if the coverage of the statements added since the "
+    "--diff-against baseline is under this percentage.",
+)
+def coverage(
+    mark,
+    single_thread,
+    numprocesses,
+    contracts_folder,
+    xml,
+    html,
+    hits,
+    branch,
+    mode,
+    sample_every,
+    stream,
+    stream_every,
+    jobs,
+    incremental,
+    contexts,
+    schedule,
+    compile_cache,
+    timings,
+    save_baseline,
+    diff_against,
+    fail_under,
+    fail_under_diff,
+):
     """Generate coverage report for Cairo Smart Contracts."""
-    args = ["-p", "no:warnings", "-n", "auto"]
+    # Nile imports the commands of every plugin on each run, so pytest, xdist
+    # and cairo-lang are only imported once the coverage runs.
+    import pytest
+
+    from nile_coverage.execution import choose_workers, collect_tests, run_in_process
+    from nile_coverage.plugins import PytestCairoCoveragePlugin
+
+    args = ["-p", "no:warnings"]
 
     if mark is not None:
         args += ["-m", mark]
 
-    sys.exit(
-        pytest.main(args, plugins=[PytestCairoCoveragePlugin(contracts_folder, xml)])
+    options = CoverageOptions(
+        hits=hits,
+        stream_every=stream_every if stream else 0,
+        contexts=contexts,
+        branch=branch,
+        mode=mode,
+        sample_every=sample_every,
+        timings=timings,
+        compile_cache=compile_cache,
+    )
+
+    # Skipped tests only reuse their covered lines, not their counts or branches.
+    if incremental and (hits or branch):
+        raise click.UsageError("--incremental doesn't record --hits or --branch.")
+    if fail_under_diff is not None and diff_against is None:
+        raise click.UsageError("--fail-under-diff needs a --diff-against baseline.")
+    baseline = BaselineOptions(save_baseline, diff_against, fail_under, fail_under_diff)
+
+    if single_thread:
+        numprocesses = "0"
+    if numprocesses != "auto" and not numprocesses.isdigit():
+        raise click.BadParameter(
+            "expected auto or a number of workers.", param_hint="'--numprocesses'"
+        )
+
+    plugin = PytestCairoCoveragePlugin(
+        contracts_folder, xml, options, jobs, incremental, schedule, baseline, html
     )
+    if numprocesses == "auto":
+        with TIMINGS.phase("collect"):
+            nodeids = collect_tests(args)
+        # Without the tests, let xdist start a worker per CPU.
+        if nodeids is not None:
+            nodeids = [nodeid for nodeid in nodeids if nodeid not in plugin.skipped]
+            workers = choose_workers(nodeids, plugin.durations)
+            numprocesses = str(workers)
+            where = f"in {workers} workers" if workers else "in this process"
+            logger.info(f"\nRunning {len(nodeids)} tests {where}.")
+
+    if numprocesses == "0":
+        exit_code = run_in_process(args + ["-n", "0"], plugins=[plugin])
+    else:
+        exit_code = pytest.main(args + ["-n", numprocesses], plugins=[plugin])
+
+    # Every test may be unchanged, which is not an error.
+    if incremental and exit_code == pytest.ExitCode.NO_TESTS_COLLECTED:
+        exit_code = pytest.ExitCode.OK
+    # Failed tests take precedence over the coverage thresholds.
+    if plugin.under_threshold and exit_code == pytest.ExitCode.OK:
+        exit_code = FAIL_UNDER_EXIT_CODE
+
+    sys.exit(exit_code)
+
+
+@click.command()
+@click.argument("location")
+@click.option(
+    "--contexts-file",
+    default=CONTEXTS_FILE,
+    show_default=True,
+    help="Index written by 'nile coverage --contexts'.",
+)
+def coverage_contexts(location, contexts_file):
+    """List the tests covering FILE:LINE (or any line of FILE)."""
+    file, _, line = location.partition(":")
+    if line and not line.isdigit():
+        raise click.BadParameter(f"Invalid line number '{line}'.")
+
+    try:
+        index = ContextIndex.load(contexts_file)
+    except OSError:
+        logger.error(
+            f"\nNo {contexts_file} file, run 'nile coverage --contexts' first."
+        )
+        sys.exit(1)
+
+    tests = index.tests_for(os.path.normpath(file), int(line) if line else None)
+    if not tests:
+        logger.info(f"\nNo test covers {location}.")
+    else:
+        logger.info("\n" + "\n".join(tests))
@@ -1,12 +1,20 @@
 """nile-coverage common module."""
 import json
 import shutil
-from dataclasses import dataclass
-from typing import DefaultDict, Set
-
-from nile_coverage.utils import JsonEncoder
+from dataclasses import dataclass, field
+from typing import DefaultDict, Dict, List, Optional, Set
 
 COVERAGE_DIRECTORY = "cairo-coverage"
+HTML_DIRECTORY = "htmlcov"
+
+
+class JsonEncoder(json.JSONEncoder):
+    """Encoder converting sets to lists."""
+
+    def default(self, obj):
+        if isinstance(obj, set):
+            return list(obj)
+        return json.JSONEncoder.default(self, obj)
 
 
 @dataclass
@@ -15,29 +23,91 @@ class CairoTraceReport:
 
     lines: DefaultDict[str, set]
     covered_lines: DefaultDict[str, set]
+    # Execution count per line, only recorded with the `hits` option.
+    hits: Dict[str, Dict[int, int]] = field(default_factory=dict)
+    # Covered lines per test, only recorded with the `contexts` option.
+    contexts: Dict[str, Dict[str, Set[int]]] = field(default_factory=dict)
+    # Masks of the possible and of the taken jnz outcomes per line, only
+    # recorded with the `branch` option (see `ProgramIndex.branches`).
+    branches: Dict[str, Dict[int, int]] = field(default_factory=dict)
+    covered_branches: Dict[str, Dict[int, int]] = field(default_factory=dict)
 
     def __repr__(self):
         data = {
             "lines": self.lines,
             "covered_lines": self.covered_lines,
         }
+        if self.hits:
+            data["hits"] = self.hits
+        if self.contexts:
+            data["contexts"] = self.contexts
+        if self.branches:
+            data["branches"] = self.branches
+            data["covered_branches"] = self.covered_branches
         return json.dumps(data, indent=2, cls=JsonEncoder)
 
 
+@dataclass
+class CoverageOptions:
+    """Recording options, sent from the controller to the xdist workers."""
+
+    hits: bool = False  # Record the execution count of each line.
+    # Stream coverage to the controller every N tests instead of writing files.
+    stream_every: int = 0
+    contexts: bool = False  # Record the lines covered by each test.
+    branch: bool = False  # Record the outcomes of the conditional jumps.
+    # How the executed pcs are recorded: "full" (every step, exact), or from
+    # the VM trace when the run ends: "first-touch" (once per run) or
+    # "sample" (one step every `sample_every`, approximate).
+    mode: str = "full"
+    sample_every: int = 100
+    timings: bool = False  # Record the wall time and call counts of the phases.
+    compile_cache: bool = False  # Cache the contracts compiled by the tests.
+    # Node ids of the tests that workers don't need to run.
+    deselect: List[str] = field(default_factory=list)
+
+    @property
+    def note(self) -> Optional[str]:
+        """Caveat of the recording mode, shown in the reports."""
+        if self.mode == "first-touch" and self.hits:
+            return "first-touch mode: execution counts are the number of VM runs."
+        if self.mode == "sample":
+            return (
+                f"sample mode (every {self.sample_every} steps): execution counts "
+                "are approximate and lines rarely run may be missed."
+            )
+        return None
+
+
 @dataclass
 class CoverageFile:
     name: str  # Filename.
-    covered: Set[int]  # Tested lines.
-    statements: Set[int]  # Lines with code.
+    covered: int  # Bitset of the tested lines (bit n set for line n).
+    statements: int  # Bitset of the lines with code.
+    hits: Dict[int, int] = field(default_factory=dict)  # Execution counts.
+    # Masks of the possible and of the taken jnz outcomes per line.
+    branches: Dict[int, int] = field(default_factory=dict)
+    covered_branches: Dict[int, int] = field(default_factory=dict)
 
     def __post_init__(self):
         """Finish initialization."""
         # Number of lines with code in the cairo file.
-        self.nb_statements = len(self.statements)
+        self.nb_statements = count_bits(self.statements)
         # Number of lines tested.
-        self.nb_covered = len(self.covered)
+        self.nb_covered = count_bits(self.covered)
+        # Number of jnz outcomes, and of the ones taken.
+        self.nb_branches = sum(map(count_bits, self.branches.values()))
+        self.nb_covered_branches = sum(
+            count_bits(mask & self.covered_branches.get(line, 0))
+            for line, mask in self.branches.items()
+        )
+
+
+def count_bits(mask: int) -> int:
+    """Number of bits set in the mask."""
+    return bin(mask).count("1")
 
 
 def clean():
     """Remove coverage files after execution."""
-    shutil.rmtree(COVERAGE_DIRECTORY)
+    shutil.rmtree(COVERAGE_DIRECTORY, ignore_errors=True)
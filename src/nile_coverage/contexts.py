@@ -0,0 +1,152 @@
+"""Index of the tests covering each line ("who covers this line")."""
+import struct
+import zlib
+from typing import Dict, List, Optional, Set, Union
+
+from nile_coverage.common import count_bits
+from nile_coverage.data import CoverageData, CoverageDataError, write_name
+
+CONTEXTS_FILE = "coverage.contexts"
+
+MAGIC = b"NILECTX\x00"
+FORMAT_VERSION = 1
+
+# How the tests of a line are stored.
+KIND_IDS = 0  # Sorted test ids, for lines covered by few tests.
+KIND_BITSET = 1  # One bit per test, for lines covered by many.
+
+_HEADER = struct.Struct("<8sB")
+_LINE = struct.Struct("<IBI")
+
+# Sorted array of test ids or bitset of test ids (as a Python int).
+TestSet = Union[List[int], int]
+
+
+class ContextIndex:
+    """
+    A table of test node ids, plus the set of test ids covering each line.
+
+    Each set is stored as whichever is smaller between a sorted array of ids
+    and a bitset over the whole test table, so lines covered by a handful of
+    tests stay small and lines covered by everything cost n/8 bytes.
+    """
+
+    def __init__(self, tests: List[str], lines: Dict[str, Dict[int, TestSet]]):
+        self.tests = tests
+        self.lines = lines
+
+    @classmethod
+    def from_data(cls, data: CoverageData) -> "ContextIndex":
+        """Build the index from the tests covering each line of merged data."""
+        bitset_size = (len(data.contexts) + 7) // 8
+        lines = {
+            file: {
+                line: (
+                    bits
+                    if count_bits(bits) * 4 > bitset_size
+                    else list(iter_test_ids(bits))
+                )
+                for line, bits in file_contexts.items()
+            }
+            for file, file_contexts in data.line_contexts.items()
+        }
+        return cls(list(data.contexts), lines)
+
+    def tests_for(self, file: str, line: Optional[int] = None) -> List[str]:
+        """Tests covering the line of the file, or any line if `line` is None."""
+        file_lines = self.lines.get(file, {})
+        if line is not None:
+            test_sets = [file_lines.get(line, [])]
+        else:
+            test_sets = file_lines.values()
+
+        test_ids: Set[int] = set()
+        for test_set in test_sets:
+            test_ids.update(iter_test_ids(test_set))
+        return sorted(self.tests[test_id] for test_id in test_ids)
+
+    def dumps(self) -> bytes:
+        """Encode the index."""
+        payload = bytearray(struct.pack("<I", len(self.tests)))
+        for test in self.tests:
+            write_name(payload, test)
+
+        bitset_size = (len(self.tests) + 7) // 8
+        payload.extend(struct.pack("<I", len(self.lines)))
+        for file, file_lines in self.lines.items():
+            write_name(payload, file)
+            payload.extend(struct.pack("<I", len(file_lines)))
+            for line, test_set in sorted(file_lines.items()):
+                if isinstance(test_set, int):
+                    payload.extend(_LINE.pack(line, KIND_BITSET, bitset_size))
+                    payload.extend(test_set.to_bytes(bitset_size, "little"))
+                else:
+                    payload.extend(_LINE.pack(line, KIND_IDS, len(test_set)))
+                    payload.extend(struct.pack(f"<{len(test_set)}I", *test_set))
+
+        return _HEADER.pack(MAGIC, FORMAT_VERSION) + zlib.compress(payload, 1)
+
+    @classmethod
+    def loads(cls, data: bytes) -> "ContextIndex":
+        """Decode an index."""
+        magic, version = _HEADER.unpack_from(data)
+        if magic != MAGIC or version > FORMAT_VERSION:
+            raise CoverageDataError("Unsupported coverage contexts file.")
+        payload = zlib.decompress(data[_HEADER.size :])
+        offset = 0
+
+        def read(fmt):
+            nonlocal offset
+            values = struct.unpack_from(fmt, payload, offset)
+            offset += struct.calcsize(fmt)
+            return values
+
+        def read_name():
+            nonlocal offset
+            (length,) = read("<H")
+            offset += length
+            return payload[offset - length : offset].decode()
+
+        (nb_tests,) = read("<I")
+        tests = [read_name() for _ in range(nb_tests)]
+
+        lines: Dict[str, Dict[int, TestSet]] = {}
+        (nb_files,) = read("<I")
+        for _ in range(nb_files):
+            file_lines = lines.setdefault(read_name(), {})
+            (nb_lines,) = read("<I")
+            for _ in range(nb_lines):
+                line, kind, size = read(_LINE.format)
+                if kind == KIND_BITSET:
+                    file_lines[line] = int.from_bytes(
+                        payload[offset : offset + size], "little"
+                    )
+                    offset += size
+                else:
+                    file_lines[line] = list(read(f"<{size}I"))
+
+        return cls(tests, lines)
+
+    def save(self, filename: str = CONTEXTS_FILE):
+        """Write the index to a file."""
+        with open(filename, "wb") as fp:
+            fp.write(self.dumps())
+
+    @classmethod
+    def load(cls, filename: str = CONTEXTS_FILE) -> "ContextIndex":
+        """Read the index from a file."""
+        with open(filename, "rb") as fp:
+            return cls.loads(fp.read())
+
+
+def iter_test_ids(test_set: TestSet):
+    """Test ids of a set, in increasing order."""
+    if not isinstance(test_set, int):
+        yield from test_set
+        return
+    bits = test_set.to_bytes((test_set.bit_length() + 7) // 8, "little")
+    for byte_index, byte in enumerate(bits):
+        while byte:
+            low = byte & -byte
+            yield (byte_index << 3) + low.bit_length() - 1
+            byte ^= low
@@ -0,0 +1,455 @@
+"""Coverage data files.
+
+Workers write their results in a compact binary format:
+
+    header:  magic (8 bytes) | version (u8) | flags (u8)
+    payload: optionally zlib compressed
+        file table: count (u32), then length (u16) and utf-8 name per file
+        lines:         count (u32), then per file: file_id (u32), kind (u8),
+                       size (u32), and either size line deltas (u32) for
+                       KIND_DELTAS, or a bitmap of size bytes, with bit n set
+                       for line n, for KIND_BITMAP
+        covered lines: same layout as lines
+        hits:          (FLAG_HITS) count (u32), then per file: file_id, n, n
+                       line deltas (u32) and n counts (u64)
+        contexts:      (FLAG_CONTEXTS) count (u32), then per context its
+                       length (u16) and utf-8 name, and a lines layout
+        branches:      (FLAG_BRANCHES) two hits layouts, with the masks of
+                       the possible and of the taken jnz outcomes as counts
+
+Line numbers are sorted and delta encoded, which keeps them small and
+compressible. Sets of lines use whichever of the deltas and the bitmap is
+smaller, and bitmaps are merged without decoding single lines. Files
+starting with anything other than the magic are read as the legacy JSON
+format.
+"""
+import json
+import os
+import struct
+import zlib
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate, compress, count
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from nile_coverage.common import COVERAGE_DIRECTORY, CairoTraceReport
+from nile_coverage.timings import TIMINGS
+
+MAGIC = b"NILECOV\x00"
+FORMAT_VERSION = 1
+
+FLAG_COMPRESSED = 1
+FLAG_HITS = 2
+FLAG_CONTEXTS = 4
+FLAG_BRANCHES = 8
+
+# How a set of lines is stored.
+KIND_DELTAS = 0
+KIND_BITMAP = 1
+
+_HEADER = struct.Struct("<8sBB")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_ENTRY = struct.Struct("<II")
+_LINES_ENTRY = struct.Struct("<IBI")
+
+# Maps the digits of `bin` to 0 and 1 bytes, and back, to decode and encode
+# bitsets without a loop over their bits.
+_BINARY_DIGITS = bytes.maketrans(b"01", b"\x00\x01")
+_FLAG_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+class CoverageDataError(Exception):
+    """Raised when a coverage data file can't be read."""
+
+
+# Raised by truncated or corrupt binary data.
+_DECODE_ERRORS = (struct.error, zlib.error, IndexError, UnicodeDecodeError)
+
+
+def dumps_report(report: CairoTraceReport, compress: bool = True) -> bytes:
+    """Encode a report in the binary format."""
+    file_ids: Dict[str, int] = {}
+    sections = bytearray()
+
+    def intern(file):
+        if file not in file_ids:
+            file_ids[file] = len(file_ids)
+        return file_ids[file]
+
+    def write_deltas(lines):
+        deltas = [lines[0]] + [b - a for a, b in zip(lines, lines[1:])]
+        sections.extend(struct.pack(f"<{len(lines)}I", *deltas))
+
+    def write_lines(lines_by_file):
+        entries = [(file, lines) for file, lines in lines_by_file.items() if lines]
+        sections.extend(_U32.pack(len(entries)))
+        for file, lines in entries:
+            file_id = intern(file)
+            bitmap_size = max(lines) // 8 + 1
+            if bitmap_size <= 4 * len(lines):
+                sections.extend(_LINES_ENTRY.pack(file_id, KIND_BITMAP, bitmap_size))
+                sections.extend(lines_bitmap(lines, bitmap_size))
+            else:
+                sections.extend(_LINES_ENTRY.pack(file_id, KIND_DELTAS, len(lines)))
+                write_deltas(sorted(lines))
+
+    def write_counts(counts_by_file):
+        entries = [(file, counts) for file, counts in counts_by_file.items() if counts]
+        sections.extend(_U32.pack(len(entries)))
+        for file, counts in entries:
+            lines = sorted(counts)
+            sections.extend(_ENTRY.pack(intern(file), len(lines)))
+            write_deltas(lines)
+            sections.extend(
+                struct.pack(f"<{len(lines)}Q", *(counts[line] for line in lines))
+            )
+
+    flags = FLAG_COMPRESSED if compress else 0
+    write_lines(report.lines)
+    write_lines(report.covered_lines)
+    if report.hits:
+        flags |= FLAG_HITS
+        write_counts(report.hits)
+    if report.contexts:
+        flags |= FLAG_CONTEXTS
+        sections.extend(_U32.pack(len(report.contexts)))
+        for context, lines_by_file in report.contexts.items():
+            write_name(sections, context)
+            write_lines(lines_by_file)
+    if report.branches:
+        flags |= FLAG_BRANCHES
+        write_counts(report.branches)
+        write_counts(report.covered_branches)
+
+    payload = bytearray(_U32.pack(len(file_ids)))
+    for file in file_ids:
+        write_name(payload, file)
+    payload.extend(sections)
+
+    if compress:
+        payload = zlib.compress(payload, 1)
+
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, flags) + bytes(payload)
+
+
+def write_name(buffer: bytearray, name: str):
+    encoded = name.encode()
+    buffer.extend(_U16.pack(len(encoded)))
+    buffer.extend(encoded)
+
+
+def lines_bitmap(lines: Iterable[int], size: int) -> bytearray:
+    """Bitmap of `size` bytes with the bits of the lines set."""
+    bitmap = bytearray(size)
+    for line in lines:
+        bitmap[line >> 3] |= 1 << (line & 7)
+    return bitmap
+
+
+def lines_bits(lines: Iterable[int]) -> int:
+    """Bitset (a bitmap read as an int) with the bits of the lines set."""
+    lines = list(lines)
+    if not lines:
+        return 0
+    # One 0 or 1 byte per line, read as binary digits from the last line.
+    flags = bytearray(max(lines) + 1)
+    for line in lines:
+        flags[line] = 1
+    return int(flags[::-1].translate(_FLAG_DIGITS), 2)
+
+
+def bitset_lines(bits: int) -> Iterator[int]:
+    """Lines whose bit is set in the bitset (a bitmap read as an int), sorted."""
+    # One 0 or 1 byte per line, starting with line 0.
+    flags = bin(bits)[:1:-1].encode().translate(_BINARY_DIGITS)
+    return compress(count(), flags)
+
+
+class _PayloadReader:
+    """Sequential reader of the payload of a binary coverage data file."""
+
+    def __init__(self, data: bytes):
+        _, version, self.flags = _HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise CoverageDataError(f"Unsupported coverage data version {version}.")
+
+        self.payload = memoryview(data)[_HEADER.size :]
+        if self.flags & FLAG_COMPRESSED:
+            self.payload = memoryview(zlib.decompress(self.payload))
+        self.offset = 0
+
+        (nb_files,) = self.read("I", 1)
+        self.files: List[str] = [self.read_name() for _ in range(nb_files)]
+
+    def read(self, fmt, size):
+        values = struct.unpack_from(f"<{size}{fmt}", self.payload, self.offset)
+        self.offset += struct.calcsize(f"<{size}{fmt}")
+        return values
+
+    def read_bytes(self, size):
+        self.offset += size
+        return self.payload[self.offset - size : self.offset]
+
+    def read_name(self):
+        (length,) = self.read("H", 1)
+        return bytes(self.read_bytes(length)).decode()
+
+    def read_lines(self, as_bits=False):
+        """
+        Read a lines layout, as sets of lines by file or, with `as_bits`, as
+        bitsets (bit n set for line n) by file id.
+        """
+        result = {}
+        (nb_entries,) = self.read("I", 1)
+        for _ in range(nb_entries):
+            file_id, kind, size = _LINES_ENTRY.unpack_from(self.payload, self.offset)
+            self.offset += _LINES_ENTRY.size
+
+            if kind == KIND_BITMAP:
+                bitmap = self.read_bytes(size)
+                bits = int.from_bytes(bitmap, "little")
+                if as_bits:
+                    result[file_id] = bits
+                else:
+                    result[self.files[file_id]] = set(bitset_lines(bits))
+            else:
+                lines = accumulate(self.read("I", size))
+                if as_bits:
+                    result[file_id] = lines_bits(lines)
+                else:
+                    result[self.files[file_id]] = set(lines)
+        return result
+
+    def read_counts(self):
+        """Read a hits layout, as counts by line by file."""
+        result = {}
+        (nb_entries,) = self.read("I", 1)
+        for _ in range(nb_entries):
+            file_id, size = self.read("I", 2)
+            lines = accumulate(self.read("I", size))
+            result[self.files[file_id]] = dict(zip(lines, self.read("Q", size)))
+        return result
+
+    def read_report(self, lines, covered_lines) -> CairoTraceReport:
+        """Read the optional sections, that follow the lines and covered lines."""
+        hits = self.read_counts() if self.flags & FLAG_HITS else {}
+        contexts = {}
+        if self.flags & FLAG_CONTEXTS:
+            (nb_contexts,) = self.read("I", 1)
+            for _ in range(nb_contexts):
+                context = self.read_name()
+                contexts[context] = self.read_lines()
+        branches, covered_branches = {}, {}
+        if self.flags & FLAG_BRANCHES:
+            branches = self.read_counts()
+            covered_branches = self.read_counts()
+
+        return CairoTraceReport(
+            lines, covered_lines, hits, contexts, branches, covered_branches
+        )
+
+
+def loads_report(data: bytes) -> CairoTraceReport:
+    """Decode a report, in either the binary or the legacy JSON format."""
+    if not data.startswith(MAGIC):
+        return _loads_json_report(data)
+
+    try:
+        reader = _PayloadReader(data)
+        lines = reader.read_lines()
+        covered_lines = reader.read_lines()
+        return reader.read_report(lines, covered_lines)
+    except _DECODE_ERRORS as e:
+        raise CoverageDataError(f"Invalid coverage data: {e}") from None
+
+
+def _loads_json_report(data: bytes) -> CairoTraceReport:
+    try:
+        raw = json.loads(data)
+    except ValueError as e:
+        raise CoverageDataError(f"Invalid coverage data: {e}") from None
+
+    def line_counts(key):
+        # JSON object keys are strings.
+        return {
+            file: {int(line): count for line, count in counts.items()}
+            for file, counts in raw.get(key, {}).items()
+        }
+
+    return CairoTraceReport(
+        lines={file: set(lines) for file, lines in raw["lines"].items()},
+        covered_lines={
+            file: set(lines) for file, lines in raw["covered_lines"].items()
+        },
+        hits=line_counts("hits"),
+        contexts={
+            context: {file: set(lines) for file, lines in lines_by_file.items()}
+            for context, lines_by_file in raw.get("contexts", {}).items()
+        },
+        branches=line_counts("branches"),
+        covered_branches=line_counts("covered_branches"),
+    )
+
+
+def write_report(report: CairoTraceReport, filename: str):
+    """Write a report to a coverage data file."""
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open(filename, "wb") as fp:
+        fp.write(dumps_report(report))
+
+
+def read_report(filename: str) -> CairoTraceReport:
+    """Read a report from a coverage data file."""
+    with open(filename, "rb") as fp:
+        return loads_report(fp.read())
+
+
+def iter_reports(directory: str = COVERAGE_DIRECTORY) -> Iterator[CairoTraceReport]:
+    """Read the coverage data files of a directory one at a time."""
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            yield read_report(path)
+
+
+def _open_data(path: str):
+    """Read a data file, with the payload of binary ones decompressed."""
+    with open(path, "rb") as fp:
+        data = fp.read()
+    return _PayloadReader(data) if data.startswith(MAGIC) else data
+
+
+class CoverageData:
+    """
+    Coverage merged from several reports.
+
+    The statements and covered lines of each file are kept as bitsets (bit n
+    set for line n, see `bitset_lines`), so binary data (see `merge_data`)
+    is merged without decoding single lines, at a cost that doesn't depend
+    on their number. Contexts (tests) get ids as they are merged, and each
+    line the bitset of the ids of the tests covering it.
+    """
+
+    def __init__(self):
+        self.statements: Dict[str, int] = defaultdict(int)
+        self.covered: Dict[str, int] = defaultdict(int)
+        self.hits: Dict[str, Counter] = defaultdict(Counter)
+        # Id of each context, in the order they were merged.
+        self.contexts: Dict[str, int] = {}
+        # Bitset of the ids of the contexts covering each line of each file.
+        self.line_contexts: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.branches: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.covered_branches: Dict[str, Dict[int, int]] = defaultdict(dict)
+
+    def merge(self, report: CairoTraceReport):
+        """Add a report to the merged data."""
+        for merged, lines_by_file in (
+            (self.statements, report.lines),
+            (self.covered, report.covered_lines),
+        ):
+            for file, lines in lines_by_file.items():
+                merged[file] |= lines_bits(lines)
+        for file, counts in report.hits.items():
+            self.hits[file].update(counts)
+        for context, lines_by_file in report.contexts.items():
+            self.add_context(context, lines_by_file)
+        for merged, masks_by_file in (
+            (self.branches, report.branches),
+            (self.covered_branches, report.covered_branches),
+        ):
+            for file, masks in masks_by_file.items():
+                file_masks = merged[file]
+                for line, mask in masks.items():
+                    file_masks[line] = file_masks.get(line, 0) | mask
+
+    def add_context(self, context: str, lines_by_file: Dict[str, Iterable[int]]):
+        """Add the lines covered by a context to the bitsets of their lines."""
+        bit = 1 << self.contexts.setdefault(context, len(self.contexts))
+        for file, lines in lines_by_file.items():
+            file_contexts = self.line_contexts[file]
+            for line in lines:
+                file_contexts[line] = file_contexts.get(line, 0) | bit
+
+    def merge_data(self, data: bytes):
+        """Add a report encoded with `dumps_report` to the merged data."""
+        if not data.startswith(MAGIC):
+            self.merge(_loads_json_report(data))
+            return
+        try:
+            self._merge_reader(_PayloadReader(data))
+        except _DECODE_ERRORS as e:
+            raise CoverageDataError(f"Invalid coverage data: {e}") from None
+
+    def _merge_reader(self, reader: "_PayloadReader"):
+        files = reader.files
+        for merged in (self.statements, self.covered):
+            for file_id, bits in reader.read_lines(as_bits=True).items():
+                merged[files[file_id]] |= bits
+        self.merge(reader.read_report({}, {}))
+
+    def to_report(self) -> CairoTraceReport:
+        """
+        The merged data, as a single report, with the covered lines of each
+        context gathered back from the bitsets of the lines.
+        """
+        contexts: Dict[str, Dict[str, Set[int]]] = {
+            context: {} for context in self.contexts
+        }
+        names = list(self.contexts)
+        for file, file_contexts in self.line_contexts.items():
+            for line, bits in file_contexts.items():
+                for context_id in bitset_lines(bits):
+                    contexts[names[context_id]].setdefault(file, set()).add(line)
+
+        return CairoTraceReport(
+            {file: set(bitset_lines(bits)) for file, bits in self.statements.items()},
+            {file: set(bitset_lines(bits)) for file, bits in self.covered.items()},
+            self.hits,
+            contexts,
+            self.branches,
+            self.covered_branches,
+        )
+
+    @classmethod
+    def from_reports(cls, reports: Iterable[CairoTraceReport]) -> "CoverageData":
+        """Merge a stream of reports."""
+        data = cls()
+        for report in reports:
+            data.merge(report)
+        return data
+
+    @classmethod
+    def from_file(cls, filename: str) -> "CoverageData":
+        """Read a coverage data file, such as a baseline."""
+        data = cls()
+        with open(filename, "rb") as fp:
+            data.merge_data(fp.read())
+        return data
+
+    @classmethod
+    def from_directory(
+        cls, directory: str = COVERAGE_DIRECTORY, threads: Optional[int] = None
+    ) -> "CoverageData":
+        """
+        Read and merge the coverage data files of a directory.
+
+        Files are read and decompressed by a pool of `threads`, as both
+        release the GIL, and merged as they come.
+        """
+        paths = [
+            path
+            for path in (
+                os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            )
+            if os.path.isfile(path)
+        ]
+        data = cls()
+        with ThreadPoolExecutor(threads) as executor:
+            for reader in executor.map(_open_data, paths):
+                TIMINGS.count("data_files")
+                if isinstance(reader, _PayloadReader):
+                    data._merge_reader(reader)
+                else:
+                    data.merge(_loads_json_report(reader))
+        return data
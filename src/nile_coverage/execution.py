@@ -0,0 +1,92 @@
+"""Whether to run the tests in the main process or in xdist workers, and how many."""
+import asyncio
+import os
+import signal
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import pytest
+
+# Seconds before a worker runs its first test: starting Python, importing
+# cairo-lang and collecting the tests again.
+WORKER_STARTUP = 3.0
+# Assumed duration in seconds of the tests never run with coverage.
+DEFAULT_DURATION = 1.0
+
+
+class _Collector:
+    """Keep the node ids of the tests selected by the collection."""
+
+    def __init__(self):
+        self.nodeids: List[str] = []
+
+    def pytest_collection_finish(self, session):
+        self.nodeids = [item.nodeid for item in session.items]
+
+
+def collect_tests(args: List[str]) -> Optional[List[str]]:
+    """
+    Node ids of the tests pytest would run with `args`, None if the collection
+    failed (the errors are reported by the run itself).
+
+    Test modules stay imported, so running the tests in this process afterwards
+    doesn't import them again.
+    """
+    collector = _Collector()
+    exit_code = pytest.main(
+        args + ["--collect-only", "-p", "no:terminal"], plugins=[collector]
+    )
+    if exit_code not in (pytest.ExitCode.OK, pytest.ExitCode.NO_TESTS_COLLECTED):
+        return None
+    return collector.nodeids
+
+
+def run_in_process(args: List[str], plugins: List[Any]) -> int:
+    """
+    Run the tests in this process, on the main thread, where tests and plugins
+    can install signal handlers (faulthandler, pytest-timeout) and Ctrl-C
+    interrupts pytest as in any run, which still reports what ran.
+
+    The command runs in an event loop, from which tests using asyncio can't
+    start theirs, so the loop is detached from the thread meanwhile. It only
+    cancels its task on Ctrl-C, which this blocking call would never see, so
+    the default handler raising KeyboardInterrupt is restored meanwhile too.
+    """
+    loop = asyncio._get_running_loop()
+    in_main_thread = threading.current_thread() is threading.main_thread()
+    if in_main_thread:
+        handler = signal.signal(signal.SIGINT, signal.default_int_handler)
+    if loop is not None:
+        asyncio._set_running_loop(None)
+        asyncio.set_event_loop(None)
+    try:
+        return pytest.main(args, plugins=plugins)
+    finally:
+        if loop is not None:
+            asyncio.set_event_loop(loop)
+            asyncio._set_running_loop(loop)
+        if in_main_thread:
+            signal.signal(signal.SIGINT, handler)
+
+
+def estimate_duration(nodeids: Iterable[str], durations: Dict[str, float]) -> float:
+    """Seconds the tests take with coverage, from the durations of previous runs."""
+    return sum(durations.get(nodeid, DEFAULT_DURATION) for nodeid in nodeids)
+
+
+def choose_workers(
+    nodeids: List[str], durations: Dict[str, float], cpus: Optional[int] = None
+) -> int:
+    """
+    Number of xdist workers to run the tests, 0 to run them in the main process.
+
+    A worker costs WORKER_STARTUP seconds before running its first test, while
+    the main process has already imported the tests to count them. Workers are
+    only worth it when each one gets at least twice that time of tests, and
+    there are never more of them than CPUs or tests.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    total = estimate_duration(nodeids, durations)
+    workers = min(cpus, len(nodeids), int(total // (2 * WORKER_STARTUP)))
+    # A single worker only adds its startup to running the tests here.
+    return workers if workers > 1 else 0
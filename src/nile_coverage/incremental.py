@@ -0,0 +1,168 @@
+"""Incremental coverage: rerun only the tests affected by changed files."""
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+from nile_coverage.cache import CACHE_DIRECTORY, SourceHasher
+from nile_coverage.common import CairoTraceReport
+from nile_coverage.data import (
+    CoverageData,
+    CoverageDataError,
+    lines_bits,
+    read_report,
+    write_report,
+)
+
+INCREMENTAL_DIRECTORY = os.path.join(CACHE_DIRECTORY, "incremental")
+
+# Bump when the layout of the state changes.
+STATE_VERSION = 2
+
+
+class IncrementalState:
+    """
+    Coverage of each test from the previous run, with the digests of the
+    files it depends on: its test module, the conftest.py files above it and
+    the Cairo files it covered (hashed with their imports).
+
+    Tests whose files are unchanged don't run again, and their persisted
+    coverage is merged with the one of the tests that do. Tests that failed or
+    errored always run again.
+    """
+
+    def __init__(self, contracts_folder: str, directory: str = INCREMENTAL_DIRECTORY):
+        self.directory = directory
+        self.hasher = SourceHasher([contracts_folder])
+        self.digests: Dict[str, str] = {}  # File digests at the last run.
+        self.tests: Dict[str, List[str]] = {}  # Files each test depends on.
+        self.failed: Set[str] = set()  # Tests that failed or errored.
+        self.report = CairoTraceReport({}, {})
+        self._current: Dict[str, Optional[str]] = {}
+        self.load()
+
+    @property
+    def state_file(self):
+        return os.path.join(self.directory, "state.json")
+
+    @property
+    def coverage_file(self):
+        return os.path.join(self.directory, "state.nile.coverage")
+
+    def load(self):
+        """Read the state of the previous run, if any and compatible."""
+        try:
+            with open(self.state_file, "r") as fp:
+                state = json.load(fp)
+            if state.get("version") != STATE_VERSION:
+                return
+            report = read_report(self.coverage_file)
+        except (OSError, ValueError, CoverageDataError):
+            return
+        self.digests = state["digests"]
+        self.tests = state["tests"]
+        self.failed = set(state["failed"])
+        self.report = report
+
+    def digest(self, file: str) -> Optional[str]:
+        """Current digest of the file, or None if it doesn't exist."""
+        if file not in self._current:
+            try:
+                if file.endswith(".cairo"):
+                    self._current[file] = self.hasher.digest(file)
+                else:
+                    with open(file, "rb") as fp:
+                        self._current[file] = hashlib.sha256(fp.read()).hexdigest()
+            except OSError:
+                self._current[file] = None
+        return self._current[file]
+
+    def changed_files(self) -> Set[str]:
+        """Files that changed since the previous run."""
+        return {
+            file for file, digest in self.digests.items() if self.digest(file) != digest
+        }
+
+    def unchanged_tests(self) -> Set[str]:
+        """
+        Node ids of the tests that passed in the previous run, and whose files
+        still exist unchanged.
+        """
+        return {
+            nodeid
+            for nodeid, files in self.tests.items()
+            if nodeid not in self.failed
+            and all(
+                self.digest(file) is not None
+                and self.digest(file) == self.digests.get(file)
+                for file in files
+            )
+        }
+
+    def update(
+        self, data: CoverageData, skipped: Set[str], failed: Iterable[str] = ()
+    ) -> CoverageData:
+        """
+        Merge the persisted coverage of the `skipped` tests into the data of
+        this run, then save it as the new state, with the tests that `failed`.
+        """
+        changed = self.changed_files()
+        for file, lines in self.report.lines.items():
+            if file not in changed:
+                data.statements[file] |= lines_bits(lines)
+        for nodeid in skipped:
+            lines_by_file = self.report.contexts.get(nodeid, {})
+            for file, lines in lines_by_file.items():
+                data.covered[file] |= lines_bits(lines)
+            data.add_context(nodeid, lines_by_file)
+
+        self.save(data, failed)
+        return data
+
+    def save(self, data: CoverageData, failed: Iterable[str] = ()):
+        """
+        Persist the coverage of each test, the digests of its files and the
+        tests that failed or errored.
+        """
+        self.failed = set(failed)
+        report = data.to_report()
+        self.tests = {
+            nodeid: sorted(set(module_files(nodeid)).union(lines_by_file))
+            for nodeid, lines_by_file in report.contexts.items()
+        }
+        files = set(data.statements)
+        for dependencies in self.tests.values():
+            files.update(dependencies)
+        self.digests = {
+            file: digest
+            for file, digest in ((file, self.digest(file)) for file in files)
+            if digest is not None
+        }
+
+        os.makedirs(self.directory, exist_ok=True)
+        write_report(report, self.coverage_file)
+        with open(self.state_file, "w") as fp:
+            json.dump(
+                {
+                    "version": STATE_VERSION,
+                    "digests": self.digests,
+                    "tests": self.tests,
+                    "failed": sorted(self.failed),
+                },
+                fp,
+            )
+
+
+def module_files(nodeid: str) -> List[str]:
+    """The test module of a node id and the conftest.py files above it."""
+    module = nodeid.split("::")[0]
+    files = [module]
+    directory = os.path.dirname(module)
+    while True:
+        conftest = os.path.join(directory, "conftest.py")
+        if os.path.isfile(conftest):
+            files.append(conftest)
+        if not directory:
+            break
+        directory = os.path.dirname(directory)
+    return files
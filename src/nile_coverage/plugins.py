@@ -1,25 +1,275 @@
 """Integration plugins."""
+import time
+from collections import defaultdict
+from dataclasses import asdict, replace
+
 import pytest
+from xdist.dsession import DSession
 from xdist.workermanage import WorkerController
 
-from nile_coverage.common import clean
-from nile_coverage.vendor.reporters import run_report
-from nile_coverage.xdist.worker import CustomRemoteHook
+from nile_coverage import logger
+from nile_coverage.baseline import (
+    BaselineOptions,
+    CoverageDiff,
+    contracts_coverage,
+    coverage_percent,
+)
+from nile_coverage.cache import get_compiled_cache, install_compiled_cache
+from nile_coverage.common import COVERAGE_DIRECTORY, CoverageOptions, clean
+from nile_coverage.contexts import ContextIndex
+from nile_coverage.data import (
+    CoverageData,
+    CoverageDataError,
+    write_report,
+)
+from nile_coverage.incremental import IncrementalState
+from nile_coverage.timings import TIMINGS, save_timings, summarize
+from nile_coverage.vendor.reporters import report_diff, report_timings, run_report
+from nile_coverage.xdist.scheduler import (
+    DurationScheduling,
+    load_durations,
+    save_durations,
+)
+from nile_coverage.xdist.worker import (
+    CustomRemoteHook,
+    process_from_remote,
+    worker_nile_coverage,
+)
 
 
 class PytestCairoCoveragePlugin:
     """Coverage Plugin."""
 
-    def __init__(self, contracts_folder, xml=False):
+    def __init__(
+        self,
+        contracts_folder,
+        xml=False,
+        options=None,
+        jobs=None,
+        incremental=False,
+        schedule="load",
+        baseline=None,
+        html=False,
+    ):
         self.contracts_folder = contracts_folder
         self.xml = xml
+        self.html = html
+        self.jobs = jobs
+        self.schedule = schedule
+        self.baseline = baseline or BaselineOptions()
+        # Whether the coverage is under one of the thresholds.
+        self.under_threshold = False
+        # Durations of the tests with coverage, from previous runs and this one.
+        self.durations = load_durations()
+        self.run_durations = defaultdict(float)
+        self.options = options or CoverageOptions()
+        TIMINGS.enabled = self.options.timings
+        self.start_time = time.perf_counter()
+        self.worker_timings = {}
+        # Hits and misses of the compiled contracts cache of each worker.
+        self.worker_compiled_cache = {}
+        if self.options.compile_cache:
+            install_compiled_cache()
+        # Incremental runs record contexts too, but only save the index if asked.
+        self.save_contexts = self.options.contexts
+
+        self.incremental = None
+        self.skipped = set()
+        # Tests that failed or errored, run again by the next incremental run.
+        self.failed = set()
+        if incremental:
+            # Workers skip the unchanged tests, and record per-test coverage.
+            self.incremental = IncrementalState(contracts_folder)
+            self.skipped = self.incremental.unchanged_tests()
+            self.options = replace(
+                self.options, contexts=True, deselect=sorted(self.skipped)
+            )
+            logger.info(
+                f"\nReusing the coverage of {len(self.skipped)} unchanged tests."
+            )
+        # Coverage streamed by the workers, when enabled.
+        self.data = CoverageData() if self.options.stream_every else None
+        # Whether the tests run in this process, without xdist workers (-n 0).
+        self.in_process = False
+
+    def pytest_addhooks(self, pluginmanager):
+        from nile_coverage.xdist import newhooks
+
+        pluginmanager.add_hookspecs(newhooks)
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_configure(self, config):
+        """Record the coverage in this process when there are no workers."""
+        self.in_process = not config.getoption("numprocesses", None)
+        if self.in_process:
+            from nile_coverage.vendor.cairo_coverage import install
+
+            install(self.options)
+
+    def pytest_unconfigure(self, config):
+        if self.in_process:
+            from nile_coverage.vendor.cairo_coverage import uninstall
+
+            uninstall()
+
+    def pytest_collection_modifyitems(self, config, items):
+        """Drop the unchanged tests of --incremental runs, as workers do."""
+        if self.in_process and self.skipped:
+            deselected = [item for item in items if item.nodeid in self.skipped]
+            if deselected:
+                items[:] = [item for item in items if item.nodeid not in self.skipped]
+                config.hook.pytest_deselected(items=deselected)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item):
+        """Attribute the coverage of the test when it runs in this process."""
+        if not self.in_process:
+            yield
+            return
+        from nile_coverage.vendor.cairo_coverage import set_context
+
+        if self.options.contexts:
+            set_context(item.nodeid)
+        start = time.time()
+        yield
+        TIMINGS.add("tests", time.time() - start)
+        TIMINGS.count("tests")
+        if self.options.contexts:
+            set_context(None)
+
+    def pytest_configure_node(self, node):
+        """Send the recording options to the xdist worker."""
+        node.workerinput["nile_coverage"] = asdict(self.options)
+
+    def pytest_nile_coverage_received(self, node, data):
+        """Merge the coverage delta streamed by a worker."""
+        with TIMINGS.phase("merge"):
+            self.data.merge_data(data)
+        TIMINGS.count("streamed_reports")
+
+    def pytest_testnodedown(self, node, error):
+        """Keep the timings and cache statistics of a worker, sent when it finishes."""
+        workeroutput = getattr(node, "workeroutput", {})
+        if "nile_coverage_timings" in workeroutput:
+            self.worker_timings[node.gateway.id] = workeroutput["nile_coverage_timings"]
+        if "nile_coverage_compiled_cache" in workeroutput:
+            self.worker_compiled_cache[node.gateway.id] = workeroutput[
+                "nile_coverage_compiled_cache"
+            ]
+
+    def pytest_xdist_make_scheduler(self, config, log):
+        if self.schedule == "duration":
+            return DurationScheduling(config, log, self.durations)
+        return None
+
+    def pytest_runtest_logreport(self, report):
+        """Add up the setup, call and teardown durations of each test."""
+        self.run_durations[report.nodeid] += report.duration
+        if report.failed:
+            self.failed.add(report.nodeid)
 
     @pytest.hookimpl(hookwrapper=True)
     def pytest_sessionfinish(self):
         yield
-        run_report(self.contracts_folder, self.xml)
+        if self.run_durations:
+            self.durations.update(self.run_durations)
+            save_durations(self.durations)
+
+        data = self.data
+        if self.in_process:
+            from nile_coverage.vendor.cairo_coverage import get_coverage_results
+
+            with TIMINGS.phase("merge"):
+                data = CoverageData.from_reports([get_coverage_results()])
+        elif data is None:
+            with TIMINGS.phase("merge"):
+                data = CoverageData.from_directory(COVERAGE_DIRECTORY)
+        if self.incremental is not None:
+            with TIMINGS.phase("incremental"):
+                data = self.incremental.update(data, self.skipped, self.failed)
+        if self.save_contexts:
+            with TIMINGS.phase("contexts"):
+                ContextIndex.from_data(data).save()
+
+        run_report(
+            self.contracts_folder,
+            self.xml,
+            data,
+            self.jobs,
+            self.options.note,
+            self.html,
+        )
+
+        # The report added the statements of the files never executed.
+        if self.baseline != BaselineOptions():
+            with TIMINGS.phase("baseline"):
+                self.check_baseline(data)
 
         clean()
 
+        compiled_cache = get_compiled_cache()
+        if compiled_cache is not None:
+            stats = [(compiled_cache.hits, compiled_cache.misses)]
+            stats.extend(self.worker_compiled_cache.values())
+            logger.info(
+                f"\nCompiled contracts cache: {sum(hits for hits, _ in stats)} hits, "
+                f"{sum(misses for _, misses in stats)} misses."
+            )
+
+        if self.options.timings:
+            TIMINGS.add("total", time.perf_counter() - self.start_time)
+            summary = summarize(TIMINGS.to_dict(), self.worker_timings)
+            report_timings(summary)
+            save_timings(summary)
+
+    def check_baseline(self, data):
+        """Compare the coverage with the baseline and the thresholds, then save it."""
+        baseline = self.baseline
+        current = contracts_coverage(
+            self.contracts_folder, data.statements, data.covered
+        )
+        failures = []
+
+        if baseline.fail_under is not None:
+            total = coverage_percent(current)
+            if total < baseline.fail_under:
+                failures.append(
+                    f"Coverage {total:.2f}% is under "
+                    f"--fail-under {baseline.fail_under}%."
+                )
+
+        if baseline.diff_against is not None:
+            try:
+                diff = CoverageDiff(
+                    CoverageData.from_file(baseline.diff_against), current
+                )
+            except (OSError, CoverageDataError) as e:
+                message = f"Can't read the baseline {baseline.diff_against}: {e}"
+                if baseline.fail_under_diff is not None:
+                    failures.append(message)
+                else:
+                    logger.warning(f"\n{message}")
+            else:
+                report_diff(diff, baseline.diff_against)
+                diff_coverage = diff.diff_coverage
+                if (
+                    baseline.fail_under_diff is not None
+                    and diff_coverage is not None
+                    and diff_coverage < baseline.fail_under_diff
+                ):
+                    failures.append(
+                        f"Diff coverage {diff_coverage:.2f}% is under "
+                        f"--fail-under-diff {baseline.fail_under_diff}%."
+                    )
+
+        if baseline.save is not None:
+            write_report(current.to_report(), baseline.save)
+
+        for failure in failures:
+            logger.error(f"\n{failure}")
+        self.under_threshold = bool(failures)
+
 
 WorkerController.RemoteHook = CustomRemoteHook
+WorkerController.process_from_remote = process_from_remote
+DSession.worker_nile_coverage = worker_nile_coverage
@@ -0,0 +1,120 @@
+"""
+Wall time, call counts and peak memory of the coverage phases (--timings).
+
+Workers record:
+    tests       running their tests, coverage included
+    vm          the coverage VMs, from their creation to the end of the run
+    cover_file  turning the pcs of each run into covered lines
+    write_data  writing or streaming their coverage data
+and the controller, along with the above when the tests run in process:
+    collect     collecting the tests to choose between workers and the process
+    merge       reading and merging the coverage of the workers
+    incremental updating the incremental state
+    contexts    saving the contexts index
+    report      the report, "statements" included
+    statements  finding the statements of the files never executed
+    total       the whole session
+"""
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+TIMINGS_FILE = "coverage-timings.json"
+
+
+class Timings:
+    """
+    Wall time per phase and call counts of the current process.
+
+    Nothing is recorded until it is enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.counts: Counter = Counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Add the wall time of the block to the `name` phase."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def add(self, name: str, seconds: float):
+        """Add wall time measured elsewhere to the `name` phase."""
+        if self.enabled:
+            self.phases[name] += seconds
+
+    def count(self, name: str, value: int = 1):
+        """Add `value` to the `name` counter."""
+        if self.enabled:
+            self.counts[name] += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The timings of the process, as sent by workers and saved as JSON."""
+        return {
+            "phases": {name: round(value, 6) for name, value in self.phases.items()},
+            "counts": dict(self.counts),
+            "peak_memory_mb": peak_memory_mb(),
+        }
+
+
+# Timings of this process.
+TIMINGS = Timings()
+
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of the process in MB, None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def summarize(
+    controller: Dict[str, Any], workers: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Put the timings of the controller and of each worker together, with the
+    worker phases and all the counts added up.
+    """
+    worker_phases: Dict[str, float] = defaultdict(float)
+    counts = Counter(controller["counts"])
+    for timings in workers.values():
+        for name, value in timings["phases"].items():
+            worker_phases[name] += value
+        counts.update(timings["counts"])
+
+    return {
+        "controller": controller,
+        "workers": dict(sorted(workers.items())),
+        "totals": {
+            "worker_phases": {
+                name: round(value, 6) for name, value in worker_phases.items()
+            },
+            "counts": dict(counts),
+        },
+    }
+
+
+def save_timings(summary: Dict[str, Any], filename: str = TIMINGS_FILE):
+    """Write the summary from `summarize` as JSON."""
+    with open(filename, "w") as fp:
+        json.dump(summary, fp, indent=2)
@@ -1,27 +1,28 @@
 """Utils for vendor packages."""
 
-import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Dict, List, Set, Tuple
 
-from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.cairo.lang.compiler.encode import OP1_IMM_BIT, PC_JNZ_BIT
+from starkware.cairo.lang.compiler.instruction import decode_instruction_values
 
+from nile_coverage.cache import get_compiled_cache, install_compiled_cache
 
-class JsonEncoder(json.JSONEncoder):
-    """Encoder converting sets to lists."""
-
-    def default(self, obj):
-        if isinstance(obj, set):
-            return list(obj)
-        return json.JSONEncoder.default(self, obj)
+# Conditional jumps of a line beyond this one are not tracked, so the outcome
+# masks of a line fit in 64 bits.
+MAX_BRANCHES_PER_LINE = 32
 
 
 def add_files_to_report(contracts_folder: str, report_dict):
-    """Add zero coverage files to report."""
+    """Add zero coverage files to report, with empty bitsets of covered lines."""
     for path, _, files in os.walk(contracts_folder):
         for name in files:
             f = os.path.join(path, name)
             if f not in report_dict and f.endswith(".cairo"):
-                report_dict[f] = []
+                report_dict[f] = 0
 
 
 def process_file(file: str):
@@ -32,35 +33,143 @@ def process_file(file: str):
     return file
 
 
-def get_file_statements(files, cairo_path=None):
-    """Get the statements from the filename."""
-    if cairo_path is None:
-        cairo_path = []
+@dataclass
+class ProgramIndex:
+    """Precomputed mapping from the pcs of a program to source lines."""
 
-    statements = dict()
-    cc = compile_starknet_files(files, cairo_path=cairo_path, debug_info=True)
+    files: List[str]  # Interned relative filenames.
+    pcs: List[int]  # Pcs with debug info.
+    # Flat (file_id, start_line, end_line, ...) entries for each pc in `pcs`.
+    locations: List[Tuple[int, ...]]
+    statements: Dict[str, Set[int]]  # Lines with code.
+    # (pc, file_id, line, bit) of each conditional jump (jnz). Its outcomes
+    # are the `bit` (condition is zero) and `bit + 1` (jump) bits of the line.
+    branches: List[Tuple[int, int, int, int]]
+    # Size of the jnz instruction at each pc, zero for the other pcs.
+    jnz_sizes: bytearray
+    # Mask of the possible outcomes of the conditional jumps of each line.
+    branch_lines: Dict[str, Dict[int, int]]
 
-    for pc in set(cc.program.debug_info.instruction_locations.keys()):
-        instruct = cc.program.debug_info.instruction_locations[pc].inst
-        file = process_file(instruct.input_file.filename)
+
+def build_program_index(program) -> ProgramIndex:
+    """Walk the debug info of the program once, climbing parent locations."""
+    files: List[str] = []
+    file_ids: Dict[str, int] = {}
+    pcs: List[int] = []
+    locations: List[Tuple[int, ...]] = []
+    statements: Dict[str, Set[int]] = {}
+    branches: List[Tuple[int, int, int, int]] = []
+    jnz_sizes = bytearray(len(program.data))
+    branch_lines: Dict[str, Dict[int, int]] = {}
+
+    for pc, location in sorted(program.debug_info.instruction_locations.items()):
+        entries: List[int] = []
+        instruct = location.inst
         while True:
+            file = process_file(instruct.input_file.filename)
             # If file is auto generated discard it.
             if "autogen" not in file:
-                lines = list(
-                    range(
-                        instruct.start_line,
-                        instruct.end_line + 1,
-                    )
-                )
-                if not file in statements:
+                if file not in file_ids:
+                    file_ids[file] = len(files)
+                    files.append(file)
                     statements[file] = set()
-                statements[file].update(lines)
+                entries += (file_ids[file], instruct.start_line, instruct.end_line)
+                statements[file].update(
+                    range(instruct.start_line, instruct.end_line + 1)
+                )
             if (
                 instruct.parent_location is not None
             ):  # Continue until we have last parent location.
                 instruct = instruct.parent_location[0]
-                file = process_file(instruct.input_file.filename)
             else:
                 break
+        pcs.append(pc)
+        locations.append(tuple(entries))
+
+        size = jnz_size(program.data, pc)
+        if size and entries:
+            # A jump belongs to the first line of its innermost location.
+            file, line = files[entries[0]], entries[1]
+            line_branches = branch_lines.setdefault(file, {})
+            mask = line_branches.get(line, 0)
+            bit = mask.bit_length()
+            if bit < 2 * MAX_BRANCHES_PER_LINE:
+                line_branches[line] = mask | (0b11 << bit)
+                branches.append((pc, entries[0], line, bit))
+                jnz_sizes[pc] = size
+
+    return ProgramIndex(
+        files=files,
+        pcs=pcs,
+        locations=locations,
+        statements=statements,
+        branches=branches,
+        jnz_sizes=jnz_sizes,
+        branch_lines=branch_lines,
+    )
+
+
+def jnz_size(data: List[int], pc: int) -> int:
+    """Size of the instruction at `pc` if it is a jnz, zero otherwise."""
+    try:
+        flags = decode_instruction_values(data[pc])[0]
+    except (AssertionError, IndexError):  # Not an instruction.
+        return 0
+    if not (flags >> PC_JNZ_BIT) & 1:
+        return 0
+    return 2 if (flags >> OP1_IMM_BIT) & 1 else 1
+
+
+def get_file_statements(files, cairo_path=None):
+    """Get the statements, and the masks of the jnz outcomes, from the filename."""
+    # The compiler takes seconds to import, only pay for it when compiling.
+    from starkware.starknet.compiler import compile as compile_module
+
+    if cairo_path is None:
+        cairo_path = []
+
+    cc = compile_module.compile_starknet_files(
+        files, cairo_path=cairo_path, debug_info=True
+    )
+
+    index = build_program_index(cc.program)
+    return index.statements, index.branch_lines
+
+
+def get_own_statements(files, cairo_path=None):
+    """Compile each file on its own, keeping only the statements of that file."""
+    statements, branches = dict(), dict()
+    for file in files:
+        file_statements, file_branches = get_file_statements([file], cairo_path)
+        if file in file_statements:
+            statements[file] = file_statements[file]
+        if file in file_branches:
+            branches[file] = file_branches[file]
+    return statements, branches
+
+
+def get_files_statements(files, cairo_path=None, jobs=None):
+    """
+    Get the statements and branches of several files, compiling them in
+    batches across a pool of `jobs` processes (default to the number of CPUs).
+    """
+    files = list(files)
+    jobs = min(jobs or os.cpu_count() or 1, len(files))
+    if jobs <= 1:
+        return get_own_statements(files, cairo_path)
+
+    # A few batches per process, to balance the load while keeping the
+    # inter-process traffic low.
+    batch_size = max(1, len(files) // (jobs * 4))
+    batches = [files[i : i + batch_size] for i in range(0, len(files), batch_size)]
 
-    return statements
+    statements, branches = dict(), dict()
+    # Processes share the compiled contracts cache too, if installed.
+    initializer = install_compiled_cache if get_compiled_cache() else None
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer) as executor:
+        for batch_statements, batch_branches in executor.map(
+            get_own_statements, batches, repeat(cairo_path)
+        ):
+            statements.update(batch_statements)
+            branches.update(batch_branches)
+    return statements, branches
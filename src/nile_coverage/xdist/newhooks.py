@@ -0,0 +1,11 @@
+"""nile-coverage xdist hooks."""
+import pytest
+
+
+@pytest.hookspec()
+def pytest_nile_coverage_received(node, data):
+    """
+    Called on the controller when a worker streams coverage data.
+
+    `data` is a report encoded with `nile_coverage.data.dumps_report`.
+    """
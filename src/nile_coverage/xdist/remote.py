@@ -15,8 +15,10 @@ import pytest
 from _pytest.config import Config, _prepareconfig
 from execnet.gateway_base import DumpError, dumps
 
-from nile_coverage.common import COVERAGE_DIRECTORY
-from nile_coverage.vendor.cairo_coverage import get_coverage_results
+from nile_coverage.cache import get_compiled_cache, install_compiled_cache
+from nile_coverage.common import COVERAGE_DIRECTORY, CoverageOptions
+from nile_coverage.data import dumps_report, write_report
+from nile_coverage.timings import TIMINGS
 
 try:
     from setproctitle import setproctitle
@@ -64,12 +66,24 @@ class WorkerInteractor:
         self.testrunuid = config.workerinput["testrunuid"]
         self.log = Producer(f"worker-{self.workerid}", enabled=config.option.debug)
         self.channel = channel
+        self.options = CoverageOptions(**config.workerinput.get("nile_coverage", {}))
+        self.tests_since_stream = 0
+        TIMINGS.enabled = self.options.timings
         config.pluginmanager.register(self)
 
     def sendevent(self, name, **kwargs):
         self.log("sending", name, kwargs)
         self.channel.send((name, kwargs))
 
+    def send_coverage(self):
+        """Stream the coverage collected since the last call to the controller."""
+        with TIMINGS.phase("write_data"):
+            report = get_coverage_results(reset=True)
+            # Tests running no Cairo still have a context, with no lines.
+            if report.lines or report.contexts:
+                self.sendevent("nile_coverage", data=dumps_report(report))
+        self.tests_since_stream = 0
+
     @pytest.hookimpl
     def pytest_internalerror(self, excrepr):
         formatted_error = str(excrepr)
@@ -88,13 +102,24 @@ class WorkerInteractor:
         # in pytest 5.0+, exitstatus is an IntEnum object
         self.config.workeroutput["exitstatus"] = int(exitstatus)
         yield
-        # write report to cov file
-        report = get_coverage_results()
-        filename = f"./{COVERAGE_DIRECTORY}/node-{self.workerid}.nile.coverage"
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, "w+") as fp:
-            fp.write(str(report))
-
+        if self.options.stream_every:
+            # send what is left before the controller gets workerfinished
+            self.send_coverage()
+        else:
+            # write report to cov file
+            with TIMINGS.phase("write_data"):
+                report = get_coverage_results()
+                filename = f"./{COVERAGE_DIRECTORY}/node-{self.workerid}.nile.coverage"
+                write_report(report, filename)
+
+        if self.options.timings:
+            self.config.workeroutput["nile_coverage_timings"] = TIMINGS.to_dict()
+        compiled_cache = get_compiled_cache()
+        if compiled_cache is not None:
+            self.config.workeroutput["nile_coverage_compiled_cache"] = [
+                compiled_cache.hits,
+                compiled_cache.misses,
+            ]
         self.sendevent("workerfinished", workeroutput=self.config.workeroutput)
 
     @pytest.hookimpl
@@ -136,9 +161,15 @@ class WorkerInteractor:
 
         worker_title("[pytest-xdist running] %s" % item.nodeid)
 
+        if self.options.contexts:
+            set_context(item.nodeid)
         start = time.time()
         self.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
         duration = time.time() - start
+        TIMINGS.add("tests", duration)
+        TIMINGS.count("tests")
+        if self.options.contexts:
+            set_context(None)
 
         worker_title("[pytest-xdist idle]")
 
@@ -146,7 +177,19 @@ class WorkerInteractor:
             "runtest_protocol_complete", item_index=self.item_index, duration=duration
         )
 
+        if self.options.stream_every:
+            self.tests_since_stream += 1
+            if self.tests_since_stream >= self.options.stream_every:
+                self.send_coverage()
+
     def pytest_collection_modifyitems(self, session, config, items):
+        # drop the tests the controller doesn't need to run (--incremental)
+        if self.options.deselect:
+            deselect = set(self.options.deselect)
+            deselected = [item for item in items if item.nodeid in deselect]
+            if deselected:
+                items[:] = [item for item in items if item.nodeid not in deselect]
+                config.hook.pytest_deselected(items=deselected)
         # add the group name to nodeid as suffix if --dist=loadgroup
         if config.getvalue("loadgroup"):
             for item in items:
@@ -291,16 +334,22 @@ def setup_config(config, basetemp):
 
 
 if __name__ == "__channelexec__":
-    # Override cairo virtual machine in workers
-    from starkware.cairo.lang.vm import cairo_runner
-
-    from nile_coverage.vendor.cairo_coverage import OverrideVm
-
-    cairo_runner.VirtualMachine = OverrideVm
+    # Only import cairo-lang in workers, the controller imports this module too.
+    from nile_coverage.vendor.cairo_coverage import (
+        get_coverage_results,
+        install,
+        set_context,
+    )
 
     channel = channel  # type: ignore[name-defined] # noqa: F821
     workerinput, args, option_dict, change_sys_path = channel.receive()  # type: ignore[name-defined]
 
+    # Override cairo virtual machine in workers
+    options = CoverageOptions(**workerinput.get("nile_coverage", {}))
+    install(options)
+    if options.compile_cache:
+        install_compiled_cache()
+
     if change_sys_path is None:
         importpath = os.getcwd()
         sys.path.insert(0, importpath)
@@ -0,0 +1,94 @@
+"""xdist scheduling using the test durations of previous coverage runs."""
+import json
+import os
+from typing import Dict
+
+from xdist.scheduler import LoadScheduling
+
+from nile_coverage.cache import CACHE_DIRECTORY
+
+DURATIONS_FILE = os.path.join(CACHE_DIRECTORY, "durations.json")
+
+# Tests queued on each worker: one running, and the next one, without which
+# the worker can't start the running one (pytest needs to know `nextitem`).
+QUEUE_SIZE = 2
+
+
+def load_durations(filename: str = DURATIONS_FILE) -> Dict[str, float]:
+    """Durations in seconds of the tests of the previous runs, by node id."""
+    try:
+        with open(filename, "r") as fp:
+            return dict(json.load(fp))
+    except (OSError, ValueError, TypeError):
+        return {}
+
+
+def save_durations(durations: Dict[str, float], filename: str = DURATIONS_FILE):
+    """Persist the test durations for the next runs."""
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "w") as fp:
+            json.dump(durations, fp)
+        os.replace(tmp_filename, filename)
+    except OSError:
+        pass
+
+
+class DurationScheduling(LoadScheduling):
+    """
+    Longest processing time first scheduling.
+
+    Tests are sorted by the duration recorded in previous runs, slowest first
+    (tests without a recorded duration are assumed to be slow), and handed
+    one at a time to whichever worker has room in its queue. Short tests then
+    fill the gaps at the end of the run, instead of a worker being left alone
+    with a long test queued in its last chunk.
+    """
+
+    def __init__(self, config, log=None, durations=None):
+        super().__init__(config, log)
+        self.durations = durations or {}
+
+    def check_schedule(self, node, duration=0):
+        """Top up the queue of the node with the next longest tests."""
+        if node.shutting_down:
+            return
+
+        if self.pending:
+            self._send_tests(node, QUEUE_SIZE - len(self.node2pending[node]))
+        else:
+            node.shutdown()
+
+        self.log("num items waiting for node:", len(self.pending))
+
+    def schedule(self):
+        """Sort the collection by duration, then deal it to the nodes."""
+        assert self.collection_is_completed
+
+        # Initial distribution already happened, reschedule on all nodes.
+        if self.collection is not None:
+            for node in self.nodes:
+                self.check_schedule(node)
+            return
+
+        if not self._check_nodes_have_same_collection():
+            self.log("**Different tests collected, aborting run**")
+            return
+
+        self.collection = list(self.node2collection.values())[0]
+        self.pending[:] = sorted(
+            range(len(self.collection)),
+            key=lambda index: -self.durations.get(self.collection[index], float("inf")),
+        )
+        if not self.collection:
+            return
+
+        # Deal the longest tests round-robin instead of in one chunk per node.
+        for _ in range(QUEUE_SIZE):
+            for node in self.nodes:
+                self._send_tests(node, 1)
+
+        if not self.pending:
+            for node in self.nodes:
+                node.shutdown()
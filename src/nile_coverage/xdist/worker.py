@@ -1,8 +1,14 @@
 """xdist WorkerController overrides."""
 import pytest
+from xdist.workermanage import WorkerController
 
 import nile_coverage.xdist.remote
 
+# Name of the event used by workers to stream coverage data.
+COVERAGE_EVENT = "nile_coverage"
+
+_process_from_remote = WorkerController.process_from_remote
+
 
 class CustomRemoteHook:
     """RemoteHook extension to handle integration."""
@@ -10,3 +16,16 @@ class CustomRemoteHook:
     @pytest.hookimpl(trylast=True)
     def pytest_xdist_getremotemodule(self):
         return nile_coverage.xdist.remote
+
+
+def process_from_remote(self, eventcall):
+    """Queue coverage events for the controller loop, leave the rest to xdist."""
+    if eventcall != self.ENDMARK and eventcall[0] == COVERAGE_EVENT:
+        self.notify_inproc(COVERAGE_EVENT, node=self, **eventcall[1])
+    else:
+        _process_from_remote(self, eventcall)
+
+
+def worker_nile_coverage(self, node, data):
+    """DSession callback for coverage events, run in the controller main thread."""
+    self.config.hook.pytest_nile_coverage_received(node=node, data=data)
@@ -0,0 +1,137 @@
+"""Tests for the coverage baselines."""
+import logging
+
+from nile_coverage import __name__ as logger_name
+from nile_coverage.baseline import (
+    BaselineOptions,
+    CoverageDiff,
+    contracts_coverage,
+    coverage_percent,
+)
+from nile_coverage.common import CairoTraceReport
+from nile_coverage.data import CoverageData, lines_bits, read_report, write_report
+from nile_coverage.plugins import PytestCairoCoveragePlugin
+
+BASELINE = CairoTraceReport(
+    lines={"contracts/a.cairo": {1, 2, 3, 4}, "contracts/b.cairo": {1, 2}},
+    covered_lines={"contracts/a.cairo": {1, 2}, "contracts/b.cairo": {1, 2}},
+)
+
+
+def test_diff():
+    """Only the files whose coverage changed are reported."""
+    current = CairoTraceReport(
+        lines={
+            "contracts/a.cairo": {1, 2, 3, 4, 5, 6},
+            "contracts/b.cairo": {1, 2},
+        },
+        covered_lines={"contracts/a.cairo": {2, 3, 5}, "contracts/b.cairo": {1, 2}},
+    )
+    diff = CoverageDiff(
+        CoverageData.from_reports([BASELINE]), CoverageData.from_reports([current])
+    )
+
+    assert [file.name for file in diff.changed] == ["contracts/a.cairo"]
+    (file,) = diff.changed
+    assert file.newly_covered == lines_bits({3, 5})
+    assert file.newly_missed == lines_bits({1, 6})
+    assert file.added == lines_bits({5, 6})
+    assert diff.before == 100 * 4 / 6
+    assert diff.after == 100 * 5 / 8
+    assert diff.diff_coverage == 50.0
+
+
+def test_no_added_statements():
+    """Without added statements there is no diff coverage."""
+    baseline = CoverageData.from_reports([BASELINE])
+    diff = CoverageDiff(baseline, baseline)
+
+    assert diff.changed == []
+    assert diff.diff_coverage is None
+
+
+def test_contracts_coverage():
+    """Only the files of the contracts folder count, with lines that have code."""
+    coverage = contracts_coverage(
+        "contracts",
+        {"contracts/a.cairo": lines_bits({1, 2}), "lib/b.cairo": lines_bits({1})},
+        {"contracts/a.cairo": lines_bits({1, 7}), "lib/b.cairo": lines_bits({1})},
+    )
+
+    assert coverage.statements == {"contracts/a.cairo": lines_bits({1, 2})}
+    assert coverage.covered == {"contracts/a.cairo": lines_bits({1})}
+    assert coverage_percent(coverage) == 50.0
+
+
+def check_baseline(tmp_path, monkeypatch, caplog, **options):
+    """Check the coverage of a run adding 2 statements, 1 covered, to BASELINE."""
+    monkeypatch.chdir(tmp_path)
+    caplog.set_level(logging.INFO, logger=logger_name)
+    write_report(BASELINE, "main.baseline")
+    data = CoverageData.from_reports(
+        [
+            CairoTraceReport(
+                lines={
+                    "contracts/a.cairo": {1, 2, 3, 4, 5, 6},
+                    "contracts/b.cairo": {1, 2},
+                },
+                covered_lines={
+                    "contracts/a.cairo": {1, 2, 5},
+                    "contracts/b.cairo": {1, 2},
+                },
+            )
+        ]
+    )
+    plugin = PytestCairoCoveragePlugin("contracts", baseline=BaselineOptions(**options))
+    plugin.check_baseline(data)
+    return plugin.under_threshold
+
+
+def test_fail_under(tmp_path, monkeypatch, caplog):
+    """The total coverage, 5 of 8 statements, is checked with or without baseline."""
+    assert check_baseline(tmp_path, monkeypatch, caplog, fail_under=62.5) is False
+    assert check_baseline(tmp_path, monkeypatch, caplog, fail_under=63.0) is True
+    assert "Coverage 62.50% is under --fail-under 63.0%." in caplog.text
+
+
+def test_fail_under_diff(tmp_path, monkeypatch, caplog):
+    """The coverage of the added statements, 1 of 2, is checked."""
+    options = {"diff_against": "main.baseline"}
+    assert not check_baseline(tmp_path, monkeypatch, caplog, **options)
+    assert "Coverage changes since main.baseline" in caplog.text
+
+    assert not check_baseline(
+        tmp_path, monkeypatch, caplog, fail_under_diff=50.0, **options
+    )
+    assert check_baseline(
+        tmp_path, monkeypatch, caplog, fail_under_diff=51.0, **options
+    )
+    assert "Diff coverage 50.00% is under --fail-under-diff 51.0%." in caplog.text
+
+
+def test_unreadable_baseline(tmp_path, monkeypatch, caplog):
+    """
+    A missing or corrupt baseline is a warning, or a failure with
+    --fail-under-diff, which can't be checked without it.
+    """
+    for content in (None, b"NILECOV\x00\xff", b"not a baseline"):
+        if content is not None:
+            (tmp_path / "broken.baseline").write_bytes(content)
+        options = {"diff_against": "broken.baseline"}
+        assert not check_baseline(tmp_path, monkeypatch, caplog, **options)
+        assert check_baseline(
+            tmp_path, monkeypatch, caplog, fail_under_diff=0.0, **options
+        )
+        assert "Can't read the baseline broken.baseline" in caplog.text
+        caplog.clear()
+
+
+def test_save_baseline(tmp_path, monkeypatch, caplog):
+    """The coverage of the contracts folder is saved as the next baseline."""
+    assert not check_baseline(tmp_path, monkeypatch, caplog, save="next.baseline")
+
+    saved = read_report(str(tmp_path / "next.baseline"))
+    assert saved.covered_lines == {
+        "contracts/a.cairo": {1, 2, 5},
+        "contracts/b.cairo": {1, 2},
+    }
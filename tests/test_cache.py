@@ -0,0 +1,110 @@
+"""Tests for the statements and compiled contracts caches."""
+import os
+import time
+
+from starkware.starknet.compiler.compile import compile_starknet_files
+
+from nile_coverage import cache as cache_module
+from nile_coverage.cache import CompiledCache, SourceHasher, StatementCache
+
+CONTRACT = """%lang starknet
+
+@view
+func double(x: felt) -> (res: felt) {
+    return (res=x * 2);
+}
+"""
+
+
+def compile_contract(cache):
+    return cache.compile(compile_starknet_files, ["contract.cairo"], debug_info=True)
+
+
+def test_compiled_cache(tmp_path, monkeypatch):
+    """Contracts are compiled once, and again when their source changes."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "contract.cairo").write_text(CONTRACT)
+    directory = str(tmp_path / "compiled")
+
+    cache = CompiledCache(directory)
+    compiled = compile_contract(cache)
+    assert compile_contract(cache) is compiled
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Another worker reads it from the disk, with its debug info.
+    cache = CompiledCache(directory)
+    cached = compile_contract(cache)
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert cached == compiled
+    assert cached.program.debug_info is not None
+
+    (tmp_path / "contract.cairo").write_text(CONTRACT.replace("x * 2", "x * 3"))
+    cache = CompiledCache(directory, max_bytes=0)
+    compile_contract(cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    # Entries over the size limit are removed.
+    assert os.listdir(directory) == []
+
+
+def test_installed_library_in_key(tmp_path, monkeypatch):
+    """Libraries installed next to cairo-lang are part of the digests."""
+    monkeypatch.chdir(tmp_path)
+    site_packages = tmp_path / "site-packages"
+    (site_packages / "library").mkdir(parents=True)
+    (site_packages / "library/math.cairo").write_text("func one() -> felt {\n")
+    (tmp_path / "contract.cairo").write_text("from library.math import one\n")
+    monkeypatch.setattr(cache_module, "cairo_lang_root", lambda: str(site_packages))
+
+    digest = SourceHasher().digest("contract.cairo")
+    (site_packages / "library/math.cairo").write_text("func one() -> felt {\n\n")
+
+    assert SourceHasher().digest("contract.cairo") != digest
+
+
+def test_statement_cache(tmp_path, monkeypatch):
+    """Statements are cached until the file or a file it imports is edited."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "library.cairo").write_text("func one() -> felt {\n")
+    (tmp_path / "contract.cairo").write_text(CONTRACT)
+    directory = str(tmp_path / "statements")
+
+    cache = StatementCache(directory=directory)
+    assert cache.get("contract.cairo") is None
+    cache.set("contract.cairo", {4, 5}, {5: 0b10})
+    # Another run reads it from the disk.
+    assert StatementCache(directory=directory).get("contract.cairo") == (
+        {4, 5},
+        {5: 0b10},
+    )
+
+    (tmp_path / "contract.cairo").write_text("from library import one\n" + CONTRACT)
+    cache = StatementCache(directory=directory)
+    assert cache.get("contract.cairo") is None
+    cache.set("contract.cairo", {5, 6}, {})
+    assert StatementCache(directory=directory).get("contract.cairo") == ({5, 6}, {})
+
+    (tmp_path / "library.cairo").write_text("func one() -> felt {\n\n")
+    assert StatementCache(directory=directory).get("contract.cairo") is None
+
+
+def test_statement_cache_prune(tmp_path, monkeypatch):
+    """The least recently used entries over `max_entries` are removed."""
+    monkeypatch.chdir(tmp_path)
+    directory = str(tmp_path / "statements")
+    cache = StatementCache(directory=directory, max_entries=2)
+    now = time.time()
+    # c is the oldest entry, a the newest.
+    for name, minutes_ago in [("c", 3), ("b", 2), ("a", 1)]:
+        (tmp_path / f"{name}.cairo").write_text(f"// {name}\n")
+        cache.set(f"{name}.cairo", {1}, {})
+        mtime = now - 60 * minutes_ago
+        os.utime(cache._path(f"{name}.cairo"), (mtime, mtime))
+
+    # Reading the oldest entry makes it the most recently used.
+    assert cache.get("c.cairo") is not None
+    cache.prune()
+
+    assert len(os.listdir(directory)) == 2
+    assert cache.get("c.cairo") is not None
+    assert cache.get("a.cairo") is not None
+    assert cache.get("b.cairo") is None
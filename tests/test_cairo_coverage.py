@@ -0,0 +1,157 @@
+"""Tests for the coverage recorded by the VM."""
+from starkware.cairo.lang.cairo_constants import DEFAULT_PRIME
+from starkware.cairo.lang.compiler.cairo_compile import compile_cairo
+from starkware.cairo.lang.vm.cairo_runner import CairoRunner
+
+from nile_coverage.common import CoverageFile, CoverageOptions
+from nile_coverage.data import CoverageData, lines_bits
+from nile_coverage.vendor.cairo_coverage import (
+    get_coverage_results,
+    install,
+    set_context,
+    uninstall,
+)
+
+FILE = "contracts/program.cairo"
+
+# loop(5) runs line 2 six times, line 5 five times and line 3 once, and
+# unused() never runs.
+LOOP = """func loop(n: felt) {
+    if (n == 0) {
+        return ();
+    }
+    return loop(n - 1);
+}
+
+func main() {
+    loop(5);
+    return ();
+}
+
+func unused() -> felt {
+    return 1;
+}
+"""
+
+# Only the else arm of the if on line 2 runs.
+SIGN = """func sign(x: felt) -> felt {
+    if (x == 0) {
+        return 0;
+    } else {
+        return 1;
+    }
+}
+
+func main() {
+    sign(3);
+    return ();
+}
+"""
+
+# Each test runs one of the functions.
+FUNCTIONS = """func double() -> felt {
+    return 3 * 2;
+}
+
+func triple() -> felt {
+    return 3 * 3;
+}
+"""
+
+
+def run(source, options, runs=1, cover_again=False, tests=None):
+    """
+    Run the main function of the source `runs` times, then return the report.
+    With `cover_again`, each run is covered a second time, as a run failing
+    after its end would be. With `tests`, run the function of each test
+    instead, in the context of the test.
+    """
+    program = compile_cairo([(source, FILE)], DEFAULT_PRIME, debug_info=True)
+    get_coverage_results(reset=True)
+    install(options)
+    calls = list(tests.items()) if tests else [(None, "main")] * runs
+    try:
+        for test, function in calls:
+            set_context(test)
+            runner = CairoRunner(program, layout="plain")
+            runner.initialize_segments()
+            end = runner.initialize_function_entrypoint(function, [])
+            runner.initialize_vm({})
+            runner.run_until_pc(end)
+            runner.end_run()
+            if cover_again:
+                runner.vm.cover_file()
+    finally:
+        set_context(None)
+        uninstall()
+    return get_coverage_results(reset=True)
+
+
+def test_hits():
+    """Lines are counted as many times as they run, across runs and merges."""
+    report = run(LOOP, CoverageOptions(hits=True))
+    assert {line: report.hits[FILE][line] for line in (2, 3, 5)} == {
+        2: 6,
+        3: 1,
+        5: 5,
+    }
+
+    # Each run adds its counts once, even covered twice.
+    report = run(LOOP, CoverageOptions(hits=True), runs=2, cover_again=True)
+    assert report.hits[FILE][2] == 12
+
+    data = CoverageData()
+    data.merge(report)
+    data.merge(run(LOOP, CoverageOptions(hits=True)))
+    assert (data.hits[FILE][2], data.hits[FILE][5]) == (18, 15)
+
+
+def test_first_touch_mode():
+    """The trace is read once per run, for the same lines as every step."""
+    full = run(LOOP, CoverageOptions())
+    first_touch = run(LOOP, CoverageOptions(mode="first-touch"))
+
+    assert first_touch.covered_lines == full.covered_lines
+    assert first_touch.lines == full.lines
+    assert 14 not in first_touch.covered_lines[FILE]
+
+
+def test_sample_mode():
+    """Sampling every step records the lines and counts of every step."""
+    full = run(LOOP, CoverageOptions(hits=True))
+    sample = run(LOOP, CoverageOptions(hits=True, mode="sample", sample_every=1))
+
+    assert sample.covered_lines == full.covered_lines
+    assert sample.hits == full.hits
+
+
+def test_branches():
+    """Both outcomes of a jnz are branches, covered once taken."""
+    report = run(SIGN, CoverageOptions(branch=True))
+    sign = CoverageFile(
+        FILE,
+        lines_bits(report.covered_lines[FILE]),
+        lines_bits(report.lines[FILE]),
+        branches=report.branches[FILE],
+        covered_branches=report.covered_branches[FILE],
+    )
+    assert list(report.branches[FILE]) == [2]
+    assert (sign.nb_covered_branches, sign.nb_branches) == (1, 2)
+
+    # The loop exits on its last call.
+    report = run(LOOP, CoverageOptions(branch=True))
+    assert report.covered_branches[FILE][2] == report.branches[FILE][2]
+
+
+def test_contexts():
+    """Lines are attributed to the tests that ran them, before and after merging."""
+    tests = {"test_double": "double", "test_triple": "triple"}
+    report = run(FUNCTIONS, CoverageOptions(contexts=True), tests=tests)
+    assert report.contexts == {
+        "test_double": {FILE: {2}},
+        "test_triple": {FILE: {6}},
+    }
+
+    data = CoverageData.from_reports([report])
+    double, triple = data.contexts["test_double"], data.contexts["test_triple"]
+    assert data.line_contexts[FILE] == {2: 1 << double, 6: 1 << triple}
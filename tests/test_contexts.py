@@ -0,0 +1,31 @@
+"""Tests for the index of the tests covering each line."""
+
+from nile_coverage.common import CairoTraceReport
+from nile_coverage.contexts import ContextIndex
+from nile_coverage.data import CoverageData
+
+CONTEXTS = {
+    f"tests/test_a.py::test_{i}": {
+        "contracts/a.cairo": {1, i + 2},
+        "contracts/b.cairo": {7} if i % 10 == 0 else set(),
+    }
+    for i in range(100)
+}
+
+
+def test_tests_for():
+    """Both sparse and dense lines list the tests covering them."""
+    # Tests arrive from the workers in any order.
+    reports = [
+        CairoTraceReport({}, {}, contexts={test: CONTEXTS[test]})
+        for test in sorted(CONTEXTS, reverse=True)
+    ]
+    data = CoverageData.from_reports(reports)
+    index = ContextIndex.loads(ContextIndex.from_data(data).dumps())
+
+    assert index.tests_for("contracts/a.cairo", 1) == sorted(CONTEXTS)
+    assert index.tests_for("contracts/a.cairo", 5) == ["tests/test_a.py::test_3"]
+    assert len(index.tests_for("contracts/b.cairo", 7)) == 10
+    assert len(index.tests_for("contracts/b.cairo")) == 10
+    assert index.tests_for("contracts/a.cairo", 1000) == []
+    assert index.tests_for("contracts/c.cairo") == []
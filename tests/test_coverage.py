@@ -2,10 +2,15 @@
 
 import logging
 
+import anyio
+import asyncclick.testing
+import pytest
 from click.testing import CliRunner
 
 from nile_coverage import __name__
+from nile_coverage.baseline import FAIL_UNDER_EXIT_CODE
 from nile_coverage.commands import coverage
+from tests.test_execution import PROGRAM, TEST_MODULE
 
 
 def test_coverage(caplog):
@@ -13,3 +18,48 @@ def test_coverage(caplog):
     caplog.set_level(logging.INFO, logger=__name__)
 
     CliRunner().invoke(coverage)
+
+
+def test_stream_every_must_be_positive():
+    """A zero or negative --stream-every is a usage error."""
+    for value in ("0", "-1"):
+        args = ["--stream", "--stream-every", value]
+        result = anyio.run(asyncclick.testing.CliRunner().invoke, coverage, args)
+        assert result.exit_code == 2
+        assert "--stream-every" in result.output
+
+
+def test_jobs_must_be_positive():
+    """A zero or negative --jobs is a usage error."""
+    for value in ("0", "-1"):
+        args = ["--jobs", value]
+        result = anyio.run(asyncclick.testing.CliRunner().invoke, coverage, args)
+        assert result.exit_code == 2
+        assert "--jobs" in result.output
+
+
+def run_command(tmp_path, monkeypatch, fail, *args):
+    """
+    Run the command in a project whose test covers 3 of its 4 statements,
+    failing with `fail`: the exit code.
+    """
+    project = tmp_path / f"project_{fail}"
+    (project / "contracts").mkdir(parents=True, exist_ok=True)
+    (project / "contracts/program.cairo").write_text(PROGRAM)
+    module = project / f"test_command_{fail}.py"
+    module.write_text(TEST_MODULE.replace("FAIL", str(fail)))
+    monkeypatch.chdir(project)
+
+    args = ["--single-thread", *args]
+    return anyio.run(asyncclick.testing.CliRunner().invoke, coverage, args).exit_code
+
+
+def test_fail_under_exit_code(tmp_path, monkeypatch):
+    """Coverage under --fail-under exits with its own code, after failed tests."""
+    assert FAIL_UNDER_EXIT_CODE not in set(pytest.ExitCode)
+    assert run_command(tmp_path, monkeypatch, False, "--fail-under", "75") == 0
+    assert (
+        run_command(tmp_path, monkeypatch, False, "--fail-under", "80")
+        == FAIL_UNDER_EXIT_CODE
+    )
+    assert run_command(tmp_path, monkeypatch, True, "--fail-under", "80") == 1
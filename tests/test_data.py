@@ -0,0 +1,91 @@
+"""Tests for coverage data files."""
+
+import pytest
+
+from nile_coverage.common import CairoTraceReport
+from nile_coverage.data import (
+    FORMAT_VERSION,
+    MAGIC,
+    CoverageData,
+    CoverageDataError,
+    bitset_lines,
+    dumps_report,
+    loads_report,
+    write_report,
+)
+
+REPORT = CairoTraceReport(
+    # Lines of b.cairo are stored as a bitmap, and the sparse ones of c.cairo
+    # as deltas.
+    lines={
+        "contracts/a.cairo": {1, 2, 3, 10},
+        "contracts/b.cairo": {4},
+        "contracts/c.cairo": {3, 5000},
+    },
+    covered_lines={"contracts/a.cairo": {2, 10}},
+    hits={"contracts/a.cairo": {2: 3, 10: 1}},
+    contexts={
+        "tests/test_a.py::test_a": {"contracts/a.cairo": {2}},
+        "tests/test_a.py::test_b": {},
+    },
+    branches={"contracts/a.cairo": {2: 0b1111}},
+    covered_branches={"contracts/a.cairo": {2: 0b0110}},
+)
+
+
+def test_binary_round_trip():
+    """Binary data decodes to the original report."""
+    for compress in (True, False):
+        report = loads_report(dumps_report(REPORT, compress=compress))
+
+        assert report.lines == REPORT.lines
+        assert report.covered_lines == REPORT.covered_lines
+        assert report.hits == REPORT.hits
+        assert report.contexts == REPORT.contexts
+        assert report.branches == REPORT.branches
+        assert report.covered_branches == REPORT.covered_branches
+
+
+def test_legacy_json():
+    """JSON data written by previous versions is still readable."""
+    report = loads_report(repr(REPORT).encode())
+
+    assert report.lines == REPORT.lines
+    assert report.hits == REPORT.hits
+
+
+def test_unsupported_version():
+    """Binary data of another format version is rejected."""
+    data = bytearray(dumps_report(REPORT))
+    data[len(MAGIC)] = FORMAT_VERSION + 1
+
+    with pytest.raises(CoverageDataError, match="version"):
+        loads_report(bytes(data))
+
+
+def test_merge():
+    """Merged reports union lines and sum hits."""
+    data = CoverageData.from_reports([REPORT, REPORT])
+
+    assert set(bitset_lines(data.statements["contracts/a.cairo"])) == {1, 2, 3, 10}
+    assert set(bitset_lines(data.covered["contracts/a.cairo"])) == {2, 10}
+    assert data.hits["contracts/a.cairo"] == {2: 6, 10: 2}
+    assert data.line_contexts["contracts/a.cairo"] == {2: 0b01}
+    assert data.to_report().contexts == REPORT.contexts
+
+
+def test_merge_directory(tmp_path):
+    """Data files, binary or JSON, are merged like their reports."""
+    write_report(REPORT, str(tmp_path / "node-gw0.nile.coverage"))
+    write_report(REPORT, str(tmp_path / "node-gw1.nile.coverage"))
+    (tmp_path / "node-gw2.nile.coverage").write_text(repr(REPORT))
+
+    data = CoverageData.from_directory(str(tmp_path))
+    expected = CoverageData.from_reports([REPORT] * 3)
+
+    assert data.statements == expected.statements
+    assert data.covered == expected.covered
+    assert data.hits == expected.hits
+    assert data.contexts == expected.contexts
+    assert data.line_contexts == expected.line_contexts
+    assert data.covered_branches == expected.covered_branches
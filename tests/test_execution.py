@@ -0,0 +1,168 @@
+"""Tests for the choice of running the tests in process or in workers."""
+import asyncio
+
+import anyio
+import pytest
+from starkware.cairo.lang.vm import cairo_runner
+from starkware.cairo.lang.vm.vm_core import VirtualMachine
+
+from nile_coverage.execution import (
+    DEFAULT_DURATION,
+    choose_workers,
+    estimate_duration,
+    run_in_process,
+)
+from nile_coverage.plugins import PytestCairoCoveragePlugin
+
+
+def test_estimate_duration():
+    """Tests never run with coverage get the default duration."""
+    durations = {"test_a": 2.5}
+
+    assert estimate_duration(["test_a", "test_b"], durations) == 2.5 + DEFAULT_DURATION
+
+
+def test_small_runs_in_process():
+    """A few short tests don't pay for starting workers."""
+    nodeids = [f"test_{i}" for i in range(5)]
+
+    assert choose_workers(nodeids, {}, cpus=8) == 0
+    assert choose_workers(["test_slow"], {"test_slow": 60.0}, cpus=8) == 0
+
+
+def test_large_runs_in_workers():
+    """Workers get enough tests to make up for their startup, up to the CPUs."""
+    nodeids = [f"test_{i}" for i in range(100)]
+    durations = {nodeid: 0.2 for nodeid in nodeids}
+
+    # 20 seconds of tests, at least 6 per worker.
+    assert choose_workers(nodeids, durations, cpus=8) == 3
+    assert choose_workers(nodeids, {}, cpus=8) == 8
+    assert choose_workers(nodeids, {}, cpus=1) == 0
+
+
+PROGRAM = """func double(x: felt) -> felt {
+    return x * 2;
+}
+
+func unused(x: felt) -> felt {
+    return x + 1;
+}
+
+func main() {
+    double(3);
+    return ();
+}
+"""
+
+# Runs contracts/program.cairo, failing with FAIL set.
+TEST_MODULE = """import os
+
+from starkware.cairo.lang.cairo_constants import DEFAULT_PRIME
+from starkware.cairo.lang.compiler.cairo_compile import compile_cairo
+from starkware.cairo.lang.vm.cairo_runner import CairoRunner
+
+
+def test_program():
+    file = os.path.join("contracts", "program.cairo")
+    with open(file) as fp:
+        program = compile_cairo([(fp.read(), file)], DEFAULT_PRIME, debug_info=True)
+    runner = CairoRunner(program, layout="plain")
+    runner.initialize_segments()
+    end = runner.initialize_main_entrypoint()
+    runner.initialize_vm({})
+    runner.run_until_pc(end)
+    runner.end_run()
+    assert not FAIL
+"""
+
+
+# Tests run after test_program, which only pass on the main thread, out of any
+# event loop.
+MAIN_THREAD_TESTS = """
+
+def test_signal():
+    import signal
+
+    previous = signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, previous)
+
+
+def test_asyncio():
+    import asyncio
+
+    assert asyncio.run(asyncio.sleep(0, result=True))
+"""
+
+# Presses Ctrl-C after test_program.
+INTERRUPT_TEST = """
+
+def test_interrupt():
+    import signal
+
+    os.kill(os.getpid(), signal.SIGINT)
+"""
+
+
+def run_project(tmp_path, monkeypatch, fail, tests="", name="in_process"):
+    """
+    Run the test of a project in this process, with coverage, followed by
+    `tests` in the same module.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "contracts").mkdir()
+    (tmp_path / "contracts/program.cairo").write_text(PROGRAM)
+    # Modules stay imported, so each content needs a name of its own.
+    module = tmp_path / f"test_{name}_{fail}.py"
+    module.write_text(TEST_MODULE.replace("FAIL", str(fail)) + tests)
+
+    plugin = PytestCairoCoveragePlugin("contracts", xml=True)
+    args = [str(module), "-p", "no:cacheprovider", "-n", "0", "-q"]
+    exit_code = run_in_process(args, plugins=[plugin])
+    assert plugin.in_process
+    return exit_code
+
+
+def test_run_in_process(tmp_path, monkeypatch):
+    """Tests run in this process report their coverage and exit code."""
+    assert run_project(tmp_path, monkeypatch, fail=False) == pytest.ExitCode.OK
+
+    xml = (tmp_path / "coverage.xml").read_text()
+    assert '<line number="2" hits="1"/>' in xml
+    assert '<line number="6" hits="0"/>' in xml
+    # The coverage VM is only installed during the run.
+    assert cairo_runner.VirtualMachine is VirtualMachine
+
+
+def test_run_in_process_failure(tmp_path, monkeypatch):
+    """A failed test gives the exit code of pytest."""
+    exit_code = run_project(tmp_path, monkeypatch, fail=True)
+
+    assert exit_code == pytest.ExitCode.TESTS_FAILED
+
+
+def test_run_in_process_main_thread(tmp_path, monkeypatch):
+    """
+    Tests run in this process can install signal handlers and start event
+    loops, though the command runs in one.
+    """
+
+    async def command():
+        loop = asyncio.get_running_loop()
+        exit_code = run_project(
+            tmp_path, monkeypatch, False, MAIN_THREAD_TESTS, "main_thread"
+        )
+        assert asyncio.get_running_loop() is loop
+        return exit_code
+
+    assert anyio.run(command) == pytest.ExitCode.OK
+
+
+def test_run_in_process_interrupted(tmp_path, monkeypatch):
+    """Ctrl-C stops the tests, which still report the coverage of those run."""
+    exit_code = run_project(tmp_path, monkeypatch, False, INTERRUPT_TEST, "interrupted")
+
+    assert exit_code == pytest.ExitCode.INTERRUPTED
+    xml = (tmp_path / "coverage.xml").read_text()
+    assert '<line number="2" hits="1"/>' in xml
+    assert cairo_runner.VirtualMachine is VirtualMachine
@@ -0,0 +1,22 @@
+"""Tests for the cost of importing the plugin."""
+import os
+import subprocess
+import sys
+
+# Packages only imported once the coverage runs.
+HEAVY_PACKAGES = {"starkware", "pytest", "_pytest", "xdist", "execnet"}
+
+
+def test_commands_import():
+    """Loading the commands, as nile does on every invocation, stays light."""
+    script = (
+        "import sys, nile_coverage.commands; "
+        "print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))"
+    )
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, env=env
+    ).stdout
+
+    assert "nile_coverage" in output.split()
+    assert HEAVY_PACKAGES.isdisjoint(output.split())
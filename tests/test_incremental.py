@@ -0,0 +1,81 @@
+"""Tests for the incremental coverage state."""
+from nile_coverage.common import CairoTraceReport
+from nile_coverage.data import CoverageData, lines_bits
+from nile_coverage.incremental import IncrementalState
+
+TEST_A = "tests/test_a.py::test_a"
+TEST_B = "tests/test_b.py::test_b"
+
+
+def first_run(tmp_path, monkeypatch, failed=()):
+    """Save the state of a run of two tests, each covering its own contract."""
+    monkeypatch.chdir(tmp_path)
+    for name in ("tests", "contracts"):
+        (tmp_path / name).mkdir()
+    (tmp_path / "tests/conftest.py").write_text("")
+    (tmp_path / "tests/test_a.py").write_text("def test_a(): pass\n")
+    (tmp_path / "tests/test_b.py").write_text("def test_b(): pass\n")
+    (tmp_path / "contracts/a.cairo").write_text("func a() {\n    ret;\n}\n")
+    (tmp_path / "contracts/b.cairo").write_text("func b() {\n    ret;\n}\n")
+
+    data = CoverageData.from_reports(
+        [
+            CairoTraceReport(
+                lines={"contracts/a.cairo": {1, 2}, "contracts/b.cairo": {1, 2}},
+                covered_lines={"contracts/a.cairo": {2}, "contracts/b.cairo": {2}},
+                contexts={
+                    TEST_A: {"contracts/a.cairo": {2}},
+                    TEST_B: {"contracts/b.cairo": {2}},
+                },
+            )
+        ]
+    )
+    IncrementalState("contracts").update(data, set(), failed)
+
+
+def test_unchanged_tests(tmp_path, monkeypatch):
+    """Tests are skipped until one of their files changes."""
+    first_run(tmp_path, monkeypatch)
+    assert IncrementalState("contracts").unchanged_tests() == {TEST_A, TEST_B}
+
+    (tmp_path / "contracts/a.cairo").write_text("func a() {\n    ret;\n\n}\n")
+    state = IncrementalState("contracts")
+    assert state.unchanged_tests() == {TEST_B}
+
+    # The coverage of the skipped test is reused.
+    data = state.update(CoverageData(), {TEST_B})
+    assert data.covered["contracts/b.cairo"] == lines_bits({2})
+    assert data.statements["contracts/b.cairo"] == lines_bits({1, 2})
+
+
+def test_failed_tests_run_again(tmp_path, monkeypatch):
+    """Failed or errored tests run again, even with unchanged files."""
+    first_run(tmp_path, monkeypatch, failed={TEST_A})
+
+    assert IncrementalState("contracts").unchanged_tests() == {TEST_B}
+
+
+def test_deleted_dependency(tmp_path, monkeypatch):
+    """A deleted file is a change, not a file without digest."""
+    first_run(tmp_path, monkeypatch)
+    (tmp_path / "tests/conftest.py").unlink()
+
+    assert IncrementalState("contracts").unchanged_tests() == set()
+
+
+def test_missing_dependency(tmp_path, monkeypatch):
+    """Tests depending on a file missing when the state was saved run again."""
+    first_run(tmp_path, monkeypatch)
+    state = IncrementalState("contracts")
+    data = CoverageData.from_reports(
+        [
+            CairoTraceReport(
+                lines={"contracts/gone.cairo": {1}},
+                covered_lines={"contracts/gone.cairo": {1}},
+                contexts={TEST_B: {"contracts/gone.cairo": {1}}},
+            )
+        ]
+    )
+    state.update(data, {TEST_A})
+
+    assert IncrementalState("contracts").unchanged_tests() == {TEST_A}
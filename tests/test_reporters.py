@@ -0,0 +1,84 @@
+"""Tests for coverage reporters."""
+
+from nile_coverage.data import lines_bits
+from nile_coverage.vendor.reporters import (
+    HtmlReporter,
+    XmlReporter,
+    format_table,
+    missing_ranges,
+    page_name,
+)
+
+
+def test_missing_ranges():
+    """Missed statements are grouped until a covered statement is found."""
+    statements = lines_bits({1, 2, 4, 7, 9, 12})
+    covered = lines_bits({1, 9})
+
+    assert missing_ranges(statements, covered) == "2-7, 12"
+    assert missing_ranges(statements, statements) == ""
+
+
+def test_format_table():
+    """Numbers are right aligned and text left aligned."""
+    table = format_table(
+        ["Filename", "Stmts", "Cover"],
+        [["contracts/a.cairo", 4, "50.00%"], ["TOTAL", 4, "50.00%"]],
+    )
+
+    assert table.splitlines() == [
+        "Filename             Stmts  Cover",
+        "-----------------  -------  -------",
+        "contracts/a.cairo        4  50.00%",
+        "TOTAL                    4  50.00%",
+    ]
+
+
+def test_condition_coverage():
+    """Lines with jnz outcomes get their condition coverage."""
+    reporter = XmlReporter(
+        "contracts",
+        {"contracts/a.cairo": lines_bits({1, 2})},
+        {"contracts/a.cairo": lines_bits({1, 2})},
+        branches={"contracts/a.cairo": {2: 0b1111}},
+        covered_branches={"contracts/a.cairo": {2: 0b0110}},
+    )
+    xml = reporter.report(as_string=True)
+
+    assert '<line number="1" hits="1"/>' in xml
+    assert 'number="2" hits="1" branch="true" condition-coverage="50% (2/4)"' in xml
+    assert 'branches-covered="2" branches-valid="4" branch-rate="0.5"' in xml
+
+
+def test_html_report(tmp_path, monkeypatch):
+    """Pages annotate the source, and are only written again once changed."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "contracts").mkdir()
+    (tmp_path / "contracts/a.cairo").write_text("func a() {\n    a < 1;\n}\n")
+    (tmp_path / "contracts/b.cairo").write_text("func b() {\n}\n")
+    statements = {"contracts/a.cairo": {1, 2}, "contracts/b.cairo": {1}}
+
+    def report(covered):
+        return HtmlReporter(
+            "contracts",
+            {file: lines_bits(lines) for file, lines in statements.items()},
+            {file: lines_bits(lines) for file, lines in covered.items()},
+        ).report("htmlcov")
+
+    assert report({"contracts/a.cairo": {1}, "contracts/b.cairo": {1}}) == 2
+    index = (tmp_path / "htmlcov/index.html").read_text()
+    page_a = page_name("contracts/a.cairo")
+    assert f'<a href="{page_a}">contracts/a.cairo</a>' in index
+    page = (tmp_path / "htmlcov" / page_a).read_text()
+    assert '<tr class="run" id="L1">' in page
+    assert '<tr class="mis" id="L2">' in page
+    assert "a &lt; 1;" in page
+
+    assert report({"contracts/a.cairo": {1}, "contracts/b.cairo": {1}}) == 0
+    assert report({"contracts/a.cairo": {1, 2}, "contracts/b.cairo": {1}}) == 1
+
+
+def test_page_names():
+    """Paths made flat the same way still get their own pages."""
+    assert page_name("a/b_c.cairo") != page_name("a_b/c.cairo")
+    assert page_name("contracts/a.cairo").startswith("contracts_a_cairo_")
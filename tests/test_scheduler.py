@@ -0,0 +1,36 @@
+"""Tests for the duration based xdist scheduling."""
+from types import SimpleNamespace
+
+from nile_coverage.xdist.scheduler import DurationScheduling
+
+
+class Node:
+    def __init__(self, name):
+        self.gateway = SimpleNamespace(id=name)
+        self.sent = []
+        self.shutting_down = False
+
+    def send_runtest_some(self, indices):
+        self.sent.extend(indices)
+
+    def shutdown(self):
+        self.shutting_down = True
+
+
+def test_longest_first():
+    """The slowest and unknown tests are dealt first, one per node in turn."""
+    collection = ["test_fast", "test_new", "test_slow", "test_medium", "test_tiny"]
+    durations = {"test_fast": 1, "test_slow": 10, "test_medium": 5, "test_tiny": 0.1}
+    config = SimpleNamespace(getvalue=lambda name: ["2*popen"])
+    scheduler = DurationScheduling(config, durations=durations)
+    nodes = [Node("gw0"), Node("gw1")]
+    for node in nodes:
+        scheduler.add_node(node)
+        scheduler.add_node_collection(node, collection)
+    scheduler.schedule()
+
+    assert [collection[i] for i in nodes[0].sent] == ["test_new", "test_medium"]
+    assert [collection[i] for i in nodes[1].sent] == ["test_slow", "test_fast"]
+
+    scheduler.mark_test_complete(nodes[1], nodes[1].sent[0], 10)
+    assert collection[nodes[1].sent[-1]] == "test_tiny"
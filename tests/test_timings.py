@@ -0,0 +1,47 @@
+"""Tests for the timings of the coverage phases."""
+from nile_coverage.timings import Timings, summarize
+
+
+def test_disabled():
+    """Nothing is recorded until the timings are enabled."""
+    timings = Timings()
+    with timings.phase("merge"):
+        pass
+    timings.add("vm", 1.0)
+    timings.count("vm_runs")
+
+    assert not timings.phases
+    assert not timings.counts
+
+
+def test_phases_and_counts():
+    """Phases add up their wall time and counters their values."""
+    timings = Timings()
+    timings.enabled = True
+    with timings.phase("merge"):
+        pass
+    timings.add("vm", 1.5)
+    timings.add("vm", 0.5)
+    timings.count("pcs", 10)
+    timings.count("pcs", 5)
+
+    result = timings.to_dict()
+    assert list(result["phases"]) == ["merge", "vm"]
+    assert result["phases"]["vm"] == 2.0
+    assert result["counts"] == {"pcs": 15}
+
+
+def test_summarize():
+    """Worker phases and all the counts are added up."""
+    controller = {"phases": {"merge": 0.5}, "counts": {"data_files": 2}}
+    workers = {
+        "gw1": {"phases": {"vm": 2.0}, "counts": {"vm_runs": 3}},
+        "gw0": {"phases": {"vm": 1.0, "tests": 4.0}, "counts": {"vm_runs": 1}},
+    }
+
+    summary = summarize(controller, workers)
+    assert list(summary["workers"]) == ["gw0", "gw1"]
+    assert summary["totals"] == {
+        "worker_phases": {"vm": 3.0, "tests": 4.0},
+        "counts": {"data_files": 2, "vm_runs": 4},
+    }
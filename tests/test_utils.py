@@ -0,0 +1,40 @@
+"""Tests for compiling the files to get their statements."""
+from nile_coverage.utils import get_files_statements
+
+LIBRARY = """func half(x: felt) -> felt {
+    return x / 2;
+}
+"""
+
+CONTRACT = """%lang starknet
+
+from lib.math import half
+
+@view
+func scale_{index}(x: felt) -> (res: felt) {{
+    if (x == {index}) {{
+        return (res=half(x));
+    }}
+    return (res=x * {index});
+}}
+"""
+
+
+def test_files_statements_in_batches(tmp_path, monkeypatch):
+    """Compiling in batches across processes gets the statements of a serial run."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "lib" / "math.cairo").write_text(LIBRARY)
+    (tmp_path / "contracts").mkdir()
+    files = []
+    for index in range(8):
+        file = f"contracts/contract_{index}.cairo"
+        (tmp_path / file).write_text(CONTRACT.format(index=index))
+        files.append(file)
+
+    serial = get_files_statements(files, [str(tmp_path)], jobs=1)
+    batched = get_files_statements(files, [str(tmp_path)], jobs=2)
+
+    statements, branches = serial
+    assert sorted(statements) == sorted(branches) == sorted(files)
+    assert batched == serial
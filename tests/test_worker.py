@@ -0,0 +1,88 @@
+"""Tests for the coverage streamed by the xdist workers."""
+import re
+
+import pytest
+
+from nile_coverage.common import CoverageOptions
+from nile_coverage.contexts import ContextIndex
+from nile_coverage.plugins import PytestCairoCoveragePlugin
+
+PROGRAM = """func double(x: felt) -> felt {
+    return x * 2;
+}
+
+func unused(x: felt) -> felt {
+    return x + 1;
+}
+
+func main() {
+    double(3);
+    return ();
+}
+"""
+
+# Tests running contracts/program.cairo, and one running no Cairo at all.
+TEST_MODULE = """import os
+
+from starkware.cairo.lang.cairo_constants import DEFAULT_PRIME
+from starkware.cairo.lang.compiler.cairo_compile import compile_cairo
+from starkware.cairo.lang.vm.cairo_runner import CairoRunner
+
+
+def run_program():
+    file = os.path.join("contracts", "program.cairo")
+    with open(file) as fp:
+        program = compile_cairo([(fp.read(), file)], DEFAULT_PRIME, debug_info=True)
+    runner = CairoRunner(program, layout="plain")
+    runner.initialize_segments()
+    end = runner.initialize_main_entrypoint()
+    runner.initialize_vm({})
+    runner.run_until_pc(end)
+    runner.end_run()
+
+
+def test_program_1():
+    run_program()
+
+
+def test_program_2():
+    run_program()
+
+
+def test_program_3():
+    run_program()
+
+
+def test_no_cairo():
+    pass
+"""
+
+
+def run_project(tmp_path, workers, stream_every):
+    """
+    Run the tests of the project in xdist workers, with hits and contexts:
+    the XML report without its timestamp, and the tests of each context.
+    """
+    options = CoverageOptions(hits=True, contexts=True, stream_every=stream_every)
+    plugin = PytestCairoCoveragePlugin("contracts", xml=True, options=options)
+    args = ["test_project.py", "-p", "no:cacheprovider", "-n", str(workers), "-q"]
+    assert pytest.main(args, plugins=[plugin]) == pytest.ExitCode.OK
+
+    xml = (tmp_path / "coverage.xml").read_text()
+    index = ContextIndex.load()
+    return re.sub(r' timestamp="\d+"', "", xml), sorted(index.tests)
+
+
+def test_streamed_coverage(tmp_path, monkeypatch):
+    """Streamed coverage is the coverage written to files by the workers."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "contracts").mkdir()
+    (tmp_path / "contracts/program.cairo").write_text(PROGRAM)
+    (tmp_path / "test_project.py").write_text(TEST_MODULE)
+
+    files = run_project(tmp_path, workers=1, stream_every=0)
+    assert '<line number="2" hits="3"/>' in files[0]
+    assert "test_project.py::test_no_cairo" in files[1]
+
+    assert run_project(tmp_path, workers=1, stream_every=1) == files
+    assert run_project(tmp_path, workers=2, stream_every=2) == files